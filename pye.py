@@ -1,4 +1,4 @@
-PYE_VERSION = " V2.80 "
+PYE_VERSION = " V2.81 "
 try:
     import usys as sys
 except Exception:
@@ -15,6 +15,7 @@ else:
     def const(x):
         return x
 from re import compile as re_compile
+from array import array
 import time
 KEY_NONE = const(0x00)
 KEY_UP = const(0x0B)
@@ -77,6 +78,346 @@ KEY_PREV_PLACE = const(0xFFE2)
 KEY_UNDO_PREV = const(0xFFE1)
 KEY_UNDO_NEXT = const(0xFFE0)
 KEY_UNDO_YANK = const(0xFFDF)
+KEY_BPASTE = const(0xFFDE)
+KEY_FIND_SHOW = const(0xFFDD)
+class LineBuffer:
+    def __len__(self):
+        return self.total
+    def pos(self, i):
+        if i < 0:
+            i += self.total
+        if not 0 <= i < self.total:
+            raise IndexError
+        return i
+    def bounds(self, s):
+        start = min(s.start or 0, self.total)
+        return start, max(start, self.total if s.stop is None else min(s.stop, self.total))
+    def __getitem__(self, i):
+        if type(i) is int:
+            return self.line(self.pos(i))
+        start, stop = self.bounds(i)
+        return [self.line(j) for j in range(start, stop)]
+    def __setitem__(self, i, lines):
+        if type(i) is int:
+            i = self.pos(i)
+            self.splice(i, i + 1, [lines])
+        else:
+            start, stop = self.bounds(i)
+            self.splice(start, stop, lines)
+    def __delitem__(self, i):
+        if type(i) is int:
+            i = self.pos(i)
+            self.splice(i, i + 1, [])
+        else:
+            start, stop = self.bounds(i)
+            self.splice(start, stop, [])
+    def __iadd__(self, lines):
+        self.splice(self.total, self.total, lines)
+        return self
+    def __iter__(self):
+        for i in range(self.total):
+            yield self.line(i)
+    def __eq__(self, other):
+        return len(other) == self.total and list(self) == list(other)
+    def pop(self, i):
+        l = self[i]
+        del self[i]
+        return l
+class ArrayBuffer(LineBuffer):
+    def __init__(self, fname, expandtabs):
+        self.text = bytearray()
+        self.ofs = array("H")
+        self.wide = False
+        self.spare = 0
+        self.total = 0
+        with open(fname) if is_micropython else open(fname, errors="ignore") as f:
+            for l in f:
+                self.splice(self.total, self.total, [expandtabs(l.rstrip())])
+    def line(self, i):
+        return str(memoryview(self.text)[self.ofs[2 * i] : self.ofs[2 * i + 1]], "utf-8")
+    def splice(self, start, stop, lines):
+        if stop - start == 1 == len(lines):
+            b = lines[0].encode()
+            i = 2 * start
+            if self.ofs[i + 1] == len(self.text):
+                self.text[self.ofs[i] :] = b
+            elif len(b) <= self.ofs[i + 1] - self.ofs[i]:
+                self.spare += self.ofs[i + 1] - self.ofs[i] - len(b)
+                self.text[self.ofs[i] : self.ofs[i] + len(b)] = b
+            else:
+                self.spare += self.ofs[i + 1] - self.ofs[i]
+                self.text += b
+                self.widen()
+                self.ofs[i] = len(self.text) - len(b)
+            self.widen()
+            self.ofs[i + 1] = self.ofs[i] + len(b)
+        else:
+            new = []
+            for l in lines:
+                new.append(len(self.text))
+                self.text += l.encode()
+                new.append(len(self.text))
+            for i in range(2 * start, 2 * stop, 2):
+                self.spare += self.ofs[i + 1] - self.ofs[i]
+            self.widen()
+            self.ofs[2 * start : 2 * stop] = array("I" if self.wide else "H", new)
+            self.total += len(lines) - (stop - start)
+        if self.spare > 256 and self.spare > len(self.text) >> 1:
+            self.compact()
+    def widen(self):
+        if not self.wide and len(self.text) > 0xFFFF:
+            self.ofs = array("I", self.ofs)
+            self.wide = True
+    def compact(self):
+        text = bytearray()
+        old = memoryview(self.text)
+        for i in range(0, 2 * self.total, 2):
+            start = len(text)
+            text += old[self.ofs[i] : self.ofs[i + 1]]
+            self.ofs[i] = start
+            self.ofs[i + 1] = len(text)
+        self.text = text
+        self.spare = 0
+class UndoRing:
+    def __init__(self, limit, budget=0):
+        self.ring = [None] * limit
+        self.size = [0] * limit
+        self.limit = limit
+        self.budget = budget
+        self.first = self.count = self.bytes = 0
+    def __len__(self):
+        return self.count
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError
+        return self.ring[(self.first + i) % self.limit]
+    def append(self, action):
+        if type(action[2]) is tuple:
+            size = len(action[2][1]) + len(action[2][2])
+        elif type(action[2]) is dict:
+            size = len(action[2])
+            for l in action[2].values():
+                size += len(l)
+        else:
+            size = len(action[2])
+            for l in action[2]:
+                size += len(l)
+        while self.count > 0 and (
+            self.count >= self.limit or (self.budget and self.bytes + size > self.budget)
+        ):
+            self.bytes -= self.size[self.first]
+            self.ring[self.first] = None
+            self.first = (self.first + 1) % self.limit
+            self.count -= 1
+        i = (self.first + self.count) % self.limit
+        self.ring[i] = action
+        self.size[i] = size
+        self.bytes += size
+        self.count += 1
+    def pop(self):
+        if self.count == 0:
+            raise IndexError
+        self.count -= 1
+        i = (self.first + self.count) % self.limit
+        action = self.ring[i]
+        self.ring[i] = None
+        self.bytes -= self.size[i]
+        return action
+    def clear(self):
+        while self.count > 0:
+            self.pop()
+        self.first = 0
+class Finder:
+    def __init__(self):
+        self.key = None
+        self.rex = None
+        self.literal = None
+        self.content = None
+        self.lower = None
+    def compile(self, pattern, case):
+        if (pattern, case) != self.key:
+            self.key = None
+            text = pattern if case == "y" else pattern.lower()
+            for c in text:
+                if c in ".^$*+?{}[]()|\\":
+                    self.rex, self.literal = re_compile(text), None
+                    break
+            else:
+                self.rex, self.literal = None, text
+            self.key = (pattern, case)
+        return self.rex
+    def lines(self, content):
+        if self.key[1] == "y":
+            return content, False
+        if type(content) is not list or len(content) > Editor.lower_lines:
+            self.lower = None
+            return content, True
+        if content is not self.content or self.lower is None or len(self.lower) != len(content):
+            self.content = content
+            self.lower = [l.lower() for l in content]
+        return self.lower, False
+    def changed(self, lnum, old, new):
+        if self.lower is not None:
+            self.lower[lnum : lnum + old] = [l.lower() for l in new]
+    def candidates(self, content, start, end):
+        return range(start, end)
+    def idle(self, content):
+        return False
+class BracketIndex:
+    block_lines = 128
+    def __init__(self, pair):
+        self.pair = pair
+        self.content = None
+        self.lines = []
+        self.starts = None
+        self.dirty = set()
+        self.size = 0
+        self.net = self.low = None
+    def count(self, l):
+        net = l.count(self.pair[0]) - l.count(self.pair[1])
+        if l.rfind(self.pair[0]) < l.find(self.pair[1]) or self.pair[1] not in l:
+            return (net, min(net, 0))
+        net = low = 0
+        for c in l:
+            if c == self.pair[0]:
+                net += 1
+            elif c == self.pair[1]:
+                net -= 1
+                low = min(low, net)
+        return (net, low)
+    def block(self, lnum):
+        k, hi = 0, len(self.starts) - 1
+        while hi - k > 1:
+            mid = (k + hi) >> 1
+            if self.starts[mid] <= lnum:
+                k = mid
+            else:
+                hi = mid
+        return k
+    def changed(self, lnum, old, new):
+        self.lines[lnum : lnum + old] = [None] * len(new)
+        if self.starts is not None:
+            k = self.block(lnum)
+            m = self.block(lnum + old - 1) if old > 1 else k
+            self.dirty.update(range(k, m + 1))
+            starts, delta = self.starts, len(new) - old
+            for j in range(k + 1, m + 1):
+                starts[j] = lnum + len(new)
+            if delta:
+                starts[m + 1 :] = [s + delta for s in starts[m + 1 :]]
+                if starts[k + 1] - starts[k] > 4 * BracketIndex.block_lines:
+                    self.starts = None
+    def update(self, content):
+        if content is not self.content or len(self.lines) != len(content):
+            self.content = content
+            self.lines = [None] * len(content)
+            self.starts = None
+        lines = self.lines
+        if self.starts is None:
+            self.starts = list(range(0, len(content), BracketIndex.block_lines))
+            self.starts.append(len(content))
+            self.size = 1
+            while self.size < len(self.starts) - 1:
+                self.size <<= 1
+            self.net = array("i", [0] * (2 * self.size))
+            self.low = array("i", [0] * (2 * self.size))
+            self.dirty = range(len(self.starts) - 1)
+        net, low = self.net, self.low
+        for b in self.dirty:
+            n = lo = 0
+            for i in range(self.starts[b], self.starts[b + 1]):
+                if lines[i] is None:
+                    lines[i] = self.count(content[i])
+                lo = min(lo, n + lines[i][1])
+                n += lines[i][0]
+            k = b + self.size
+            net[k], low[k] = n, lo
+            if type(self.dirty) is set:
+                k >>= 1
+                while k:
+                    net[k] = net[2 * k] + net[2 * k + 1]
+                    low[k] = min(low[2 * k], net[2 * k] + low[2 * k + 1])
+                    k >>= 1
+        if type(self.dirty) is not set:
+            for k in range(self.size - 1, 0, -1):
+                net[k] = net[2 * k] + net[2 * k + 1]
+                low[k] = min(low[2 * k], net[2 * k] + low[2 * k + 1])
+        self.dirty = set()
+    def forward(self, line, depth):
+        if line >= len(self.lines):
+            return -1, depth
+        b = self.block(line)
+        line, depth = self.forward_lines(line, self.starts[b + 1], depth)
+        if line >= 0 or b + 1 >= self.size:
+            return line, depth
+        k = b + 1 + self.size
+        while depth + self.low[k] >= 0:
+            depth += self.net[k]
+            while k & 1:
+                k >>= 1
+            if k == 0:
+                return -1, depth
+            k += 1
+        while k < self.size:
+            if depth + self.low[2 * k] < 0:
+                k = 2 * k
+            else:
+                depth += self.net[2 * k]
+                k = 2 * k + 1
+        b = k - self.size
+        return self.forward_lines(self.starts[b], self.starts[b + 1], depth)
+    def forward_lines(self, line, end, depth):
+        while line < end:
+            net, low = self.lines[line]
+            if depth + low < 0:
+                return line, depth
+            depth += net
+            line += 1
+        return -1, depth
+    def backward(self, line, depth):
+        if line < 0:
+            return -1, depth
+        b = self.block(line)
+        line, depth = self.backward_lines(line, self.starts[b], depth)
+        if line >= 0 or b == 0:
+            return line, depth
+        k = b - 1 + self.size
+        while self.net[k] - self.low[k] <= depth:
+            depth -= self.net[k]
+            while not k & 1:
+                k >>= 1
+            if k == 1:
+                return -1, depth
+            k -= 1
+        while k < self.size:
+            if self.net[2 * k + 1] - self.low[2 * k + 1] > depth:
+                k = 2 * k + 1
+            else:
+                depth -= self.net[2 * k + 1]
+                k = 2 * k
+        b = k - self.size
+        return self.backward_lines(self.starts[b + 1] - 1, self.starts[b], depth)
+    def backward_lines(self, line, start, depth):
+        while line >= start:
+            net, low = self.lines[line]
+            if net - low > depth:
+                return line, depth
+            depth -= net
+            line -= 1
+        return -1, depth
+    def scan(self, l, col, way, depth):
+        stop = len(l) if way > 0 else -1
+        while col != stop:
+            if l[col] == self.pair[0]:
+                depth += way
+            elif l[col] == self.pair[1]:
+                depth -= way
+            if depth < 0:
+                return col, depth
+            col += way
+        return -1, depth
 class Editor:
     KEYMAP = {
         "\x1b[A": KEY_UP,
@@ -149,6 +490,9 @@ class Editor:
         "\x1b[6;3~": KEY_NEXT_PLACE,
         "\x1b[1;3H": KEY_UNDO_PREV,
         "\x1b[1;3F": KEY_UNDO_NEXT,
+        "\x1b[200~": KEY_BPASTE,
+        "\x1bOR": KEY_FIND_SHOW,
+        "\x1b[13~": KEY_FIND_SHOW,
     }
     TERMCMD = [
         "\x1b[{row};{col}H",
@@ -167,41 +511,85 @@ class Editor:
         "\b",
         "{chd}{file} Row: {row}/{total} Col: {col}  {msg}",
         "{chd}{file} {row}:{col}  {msg}",
+        "\x1b[?2004h",
+        "\x1b[?2004l",
+        "\x1b[46m",
+        "\x1b[{n}@",
+        "\x1b[{n}P",
+        "\x1b[{n}L",
+        "\x1b[{n}M",
+        "\x1b[{n}A",
+        "\x1b[{n}C",
+        "\x1b[{n}D",
     ]
     yank_buffer = []
     find_pattern = ""
     case = "n"
     autoindent = "y"
     replc_pattern = ""
+    find_show = False
+    scrtop = None
+    scrpos = None
     comment_char = "\x23 "
     word_char = "_\\"
     file_char = "_.-"
-    match_span = 50
     place_list = []
     place_index = 0
     max_places = 20
+    content_type = None
+    undo_budget = 0
+    key_trie = None
+    key_map = None
+    lower_lines = 0 if is_micropython else 200000
+    finder_type = Finder
     def __init__(self, tab_size, undo_limit, io_device):
         self.top_line = self.cur_line = self.row = self.vcol = self.col = self.margin = 0
         self.tab_size = tab_size
         self.changed = ""
-        self.hash = 0
+        self.hash = self.hash_now = 0
+        self.hash_pend = None
+        self.finder = Editor.finder_type()
+        self.span_key = None
+        self.span_cache = {}
+        self.brackets = {}
         self.message = self.fname = ""
         self.content = [""]
-        self.undo = []
+        self.undo = UndoRing(undo_limit, Editor.undo_budget)
         self.undo_limit = undo_limit
         self.undo_index = 0
-        self.redo = []
+        self.redo = UndoRing(undo_limit, Editor.undo_budget)
         self.clear_mark()
         self.write_tabs = "n"
         self.work_dir = os.getcwd()
         self.io_device = io_device
         self.wr = io_device.wr
         self.is_dir = False
-        self.key_max = 0
-        for _ in Editor.KEYMAP.keys():
-            self.key_max = max(self.key_max, len(_))
+        self.key_pend = ""
+        if Editor.KEYMAP != Editor.key_map:
+            self.compile_keys()
     def goto(self, row, col):
-        self.wr(Editor.TERMCMD[0].format(row=row + 1, col=col + 1))
+        pos, Editor.scrpos = Editor.scrpos, (row, col)
+        if pos == (row, col):
+            return
+        cmd = Editor.TERMCMD[0].format(row=row + 1, col=col + 1)
+        if pos is not None and Editor.TERMCMD[23] and (row <= pos[0] or row < Editor.height):
+            r, c = pos
+            if row < r:
+                move = Editor.TERMCMD[23].format(n=r - row)
+            elif row > r:
+                move, c = "\r" + "\n" * (row - r), 0
+            else:
+                move = ""
+            if col == 0 and c > 0:
+                move += "\r"
+            elif col > c:
+                move += Editor.TERMCMD[24].format(n=col - c)
+            elif col < c:
+                left = Editor.TERMCMD[25].format(n=c - col)
+                move += left if len(left) < c - col else Editor.TERMCMD[13] * (c - col)
+            if len(move) < len(cmd):
+                cmd = move
+        self.wr(cmd)
     def clear_to_eol(self):
         self.wr(Editor.TERMCMD[1])
     def cursor(self, onoff):
@@ -211,65 +599,212 @@ class Editor:
             self.wr(Editor.TERMCMD[5])
         elif mode == 2:
             self.wr(Editor.TERMCMD[6])
+        elif mode == 3:
+            self.wr(Editor.TERMCMD[18])
         else:
             self.wr(Editor.TERMCMD[4])
     def mouse_reporting(self, onoff):
         self.wr(
             Editor.TERMCMD[7] if onoff else Editor.TERMCMD[8]
         )
+    def paste_mode(self, onoff):
+        self.wr(Editor.TERMCMD[16] if onoff else Editor.TERMCMD[17])
     def scroll_region(self, stop):
         self.wr(
             Editor.TERMCMD[11].format(stop=stop) if stop else Editor.TERMCMD[12]
         )
+        Editor.scrpos = None
     def scroll_up(self, scrolling):
         if Editor.TERMCMD[9]:
             Editor.scrbuf[scrolling:] = Editor.scrbuf[:-scrolling]
-            Editor.scrbuf[:scrolling] = [""] * scrolling
+            Editor.scrbuf[:scrolling] = [(False, "")] * scrolling
             self.goto(0, 0)
             self.wr(Editor.TERMCMD[9] * scrolling)
     def scroll_down(self, scrolling):
         if Editor.TERMCMD[10]:
             Editor.scrbuf[:-scrolling] = Editor.scrbuf[scrolling:]
-            Editor.scrbuf[-scrolling:] = [""] * scrolling
+            Editor.scrbuf[-scrolling:] = [(False, "")] * scrolling
             self.goto(Editor.height - 1, 0)
             self.wr(Editor.TERMCMD[10] * scrolling)
+    def shift_rows(self):
+        height, top = Editor.height, self.top_line
+        scrtop, Editor.scrtop = Editor.scrtop, (top, self.margin)
+        new = [
+            self.content[line][self.margin : self.margin + Editor.width]
+            if line < self.total_lines
+            else ""
+            for line in range(top, top + height)
+        ]
+        old = [r[1] if type(r) is tuple and r[1] != "\x00" else None for r in Editor.scrbuf]
+        def saved(start, d):
+            res = 0
+            for m in range(start, height + min(d, 0)):
+                if new[m] == old[m - d] != old[m]:
+                    res += len(new[m]) + 1
+                elif new[m] == old[m] != old[m - d]:
+                    res -= len(new[m]) + 1
+            return res
+        lines = Editor.TERMCMD[21] and Editor.TERMCMD[22]
+        if scrtop is not None and scrtop[1] == self.margin and 0 < abs(scrtop[0] - top) < height:
+            d = scrtop[0] - top
+            if saved(max(d, 0), d) > 2 * abs(d):
+                if lines and len(Editor.TERMCMD[21]) < abs(d):
+                    self.move_rows(0, d)
+                elif d > 0:
+                    self.scroll_up(d)
+                else:
+                    self.scroll_down(-d)
+                return
+        if not lines:
+            return
+        a = 0
+        while a < height and new[a] == old[a]:
+            a += 1
+        rows = {}
+        for j in range(height - 1, a - 1, -1):
+            rows[old[j]] = j
+        for i in range(a, height):
+            j = rows.get(new[i])
+            if new[i] and j is not None and j != i:
+                break
+        else:
+            return
+        d = i - j
+        if saved(i, d) > 2 * len(Editor.TERMCMD[21]):
+            self.move_rows(min(i, j), d)
+    def move_rows(self, row, d):
+        self.goto(row, 0)
+        if d > 0:
+            self.wr(Editor.TERMCMD[21].format(n=d))
+            Editor.scrbuf[row + d :] = Editor.scrbuf[row : Editor.height - d]
+            Editor.scrbuf[row : row + d] = [(False, "")] * d
+        else:
+            self.wr(Editor.TERMCMD[22].format(n=-d))
+            Editor.scrbuf[row:] = Editor.scrbuf[row - d :] + [(False, "")] * -d
+    def update_line(self, c, l):
+        old = Editor.scrbuf[c]
+        if l[0] or len(l) > 2 or type(old) is not tuple or old[0] or len(old) > 2:
+            return False
+        old, new, width = old[1], l[1], Editor.width
+        if old == "\x00":
+            return False
+        p, end = 0, min(len(old), len(new))
+        while p < end and old[p] == new[p]:
+            p += 1
+        n, tail = len(new) - len(old), ""
+        if n == 0 and p < end and len(new) == width:
+            n = new.find(old[p : p + 8], p + 1) - p
+            if n <= 0 or new[p + n :] != old[p : width - n]:
+                n = p - old.find(new[p : p + 8], p + 1)
+                if n >= 0 or old[p - n :] != new[p : width + n]:
+                    n = 0
+                else:
+                    tail = new[width + n :]
+        elif (n > 0 and new[p + n :] != old[p:]) or (n < 0 and new[p:] != old[p - n :]):
+            n = 0
+        cmd = Editor.TERMCMD[19 if n > 0 else 20]
+        self.goto(c, p)
+        if n and cmd and len(cmd) + abs(n) + len(tail) < len(new) - p:
+            if n > 0:
+                self.wr(cmd.format(n=n))
+                self.wr(new[p : p + n])
+                end = p + n
+            else:
+                self.wr(cmd.format(n=-n))
+                end = p
+                if tail:
+                    self.goto(c, width - len(tail))
+                    self.wr(tail)
+                    end = width
+        else:
+            end = len(new)
+            if len(old) == end:
+                while end > p and old[end - 1] == new[end - 1]:
+                    end -= 1
+            self.wr(new[p:end])
+            if len(new) < len(old):
+                self.clear_to_eol()
+        Editor.scrpos = (c, end) if end < width else None
+        Editor.scrbuf[c] = l
+        return True
     def redraw(self, flag):
         self.cursor(False)
         Editor.height, Editor.width = self.io_device.get_screen_size()
         Editor.height -= 1
         Editor.scrbuf = [(False, "\x00")] * Editor.height
+        Editor.scrtop = None
         self.row = min(Editor.height - 1, self.row)
         self.scroll_region(Editor.height)
         self.mouse_reporting(True)
+        self.paste_mode(True)
         if flag:
-            self.message = PYE_VERSION
+            self.message = PYE_VERSION + "Undo {} Bytes".format(self.undo.bytes + self.redo.bytes)
         if is_micropython:
             gc.collect()
             if flag:
-                self.message += "{} Bytes Memory available".format(gc.mem_free())
+                self.message += ", {} Bytes Memory available".format(gc.mem_free())
         self.changed = "" if self.hash == self.hash_buffer() else "*"
-    def get_input(
-        self,
-    ):
+    def compile_keys(self):
+        trie = {}
+        for seq, key in Editor.KEYMAP.items():
+            node = trie
+            for c in seq[:-1]:
+                nxt = node.get(c)
+                if type(nxt) is not dict:
+                    nxt = node[c] = {} if nxt is None else {"": nxt}
+                node = nxt
+            if type(node.get(seq[-1])) is dict:
+                node[seq[-1]][""] = key
+            else:
+                node[seq[-1]] = key
+        Editor.key_trie = trie
+        Editor.key_map = dict(Editor.KEYMAP)
+    def rd(self):
+        if self.key_pend:
+            c = self.key_pend[0]
+            self.key_pend = self.key_pend[1:]
+        else:
+            c = self.io_device.rd()
+            if len(c) > 1:
+                self.key_pend = c[1:]
+                c = c[0]
+        return c
+    def get_input(self):
         while True:
-            in_buffer = self.io_device.rd()
-            if in_buffer[0] == "\x1b":
-                while True:
-                    in_buffer += self.io_device.rd()
-                    c = in_buffer[-1]
-                    if c == "~" or (c.isalpha() and len(in_buffer) > 2):
-                        break
-                    if len(in_buffer) == 2 and c.isalpha() and c != "O":
-                        in_buffer = chr(ord(in_buffer[1]) & 0x1F)
-                        break
-                    if len(in_buffer) >= self.key_max:
-                        break
-                    if in_buffer == "\x1b\x1b":
-                        in_buffer = "\x1b"
-                        break
-            if in_buffer in Editor.KEYMAP:
-                c = Editor.KEYMAP[in_buffer]
-                if c != KEY_MOUSE:
+            c = self.rd()
+            key = Editor.key_trie.get(c)
+            if c == "\x1b":
+                c = self.rd()
+                if c == "\x1b":
+                    key = key.get("")
+                elif c.isalpha() and c != "O":
+                    key = Editor.key_trie.get(chr(ord(c) & 0x1F))
+                else:
+                    key = key.get(c)
+            elif key is None and ord(c) >= 32:
+                return KEY_NONE, c
+            while type(key) is dict:
+                c = self.rd()
+                key = key.get(c)
+            if key is None:
+                while "\x20" <= c <= "\x3f":
+                    c = self.rd()
+            else:
+                c = key
+                if c == KEY_BPASTE:
+                    lines = [""]
+                    last = ""
+                    while True:
+                        c = self.rd()
+                        if c == "\r" or (c == "\n" and last != "\r"):
+                            lines.append("")
+                        elif c != "\n":
+                            lines[-1] += c
+                            if c == "~" and lines[-1].endswith("\x1b[201~"):
+                                lines[-1] = lines[-1][:-6]
+                                return KEY_BPASTE, lines
+                        last = c
+                elif c != KEY_MOUSE:
                     return c, None
                 else:
                     mouse_fct = ord(self.io_device.rd_raw())
@@ -281,9 +816,7 @@ class Editor:
                         return KEY_SCRLUP, 3
                     else:
                         return KEY_MOUSE, [mouse_x, mouse_y, mouse_fct]
-            elif ord(in_buffer[0]) >= 32:
-                return KEY_NONE, in_buffer
-    def display_window(self):
+    def display_window(self, update=True):
         self.cur_line = min(self.total_lines - 1, max(self.cur_line, 0))
         self.vcol = max(0, min(self.col, len(self.content[self.cur_line])))
         if self.vcol >= Editor.width + self.margin:
@@ -293,8 +826,28 @@ class Editor:
         if not (self.top_line <= self.cur_line < self.top_line + Editor.height):
             self.top_line = max(self.cur_line - self.row, 0)
         self.row = self.cur_line - self.top_line
+        if not update:
+            return
+        if getattr(self.io_device, "frame", False):
+            frame = []
+            self.wr = frame.append
+            try:
+                self.update_screen()
+            finally:
+                self.wr = self.io_device.wr
+                self.wr("".join(frame))
+        else:
+            self.update_screen()
+    def update_screen(self):
         self.cursor(False)
+        self.shift_rows()
         line = self.top_line
+        show = Editor.find_show and Editor.find_pattern
+        if show:
+            try:
+                self.finder.compile(Editor.find_pattern, Editor.case)
+            except Exception:
+                show = False
         if self.mark is None:
             flag = 0
         else:
@@ -315,12 +868,27 @@ class Editor:
                         + (((end_line - 1) == line) << 2)
                     )
                 l = (flag, self.content[line][self.margin : self.margin + Editor.width])
-                if (flag and line == self.cur_line) or l != Editor.scrbuf[
-                    c
-                ]:
+                if show and not flag:
+                    spans = tuple(
+                        (max(start - self.margin, 0), end - self.margin)
+                        for start, end in self.line_spans(self.content[line])
+                        if end > self.margin and start < self.margin + Editor.width
+                    )
+                    if spans:
+                        l = (flag, l[1], spans)
+                if (flag and line == self.cur_line) or (
+                    l != Editor.scrbuf[c] and not self.update_line(c, l)
+                ):
                     self.goto(c, 0)
                     if flag == 0:
-                        self.wr(l[1])
+                        start = 0
+                        for span in l[2] if len(l) > 2 else ():
+                            self.wr(l[1][start : span[0]])
+                            self.hilite(3)
+                            self.wr(l[1][span[0] : span[1]])
+                            self.hilite(0)
+                            start = span[1]
+                        self.wr(l[1][start:])
                     elif flag == 7:
                         self.wr(l[1][:start_col])
                         self.hilite(2)
@@ -331,7 +899,8 @@ class Editor:
                         self.wr(l[1][:start_col])
                         self.hilite(2)
                         self.wr(l[1][start_col:])
-                        self.wr(" ")
+                        if len(l[1]) < Editor.width:
+                            self.wr(" ")
                         self.hilite(0)
                     elif flag == 5:
                         self.hilite(2)
@@ -341,24 +910,30 @@ class Editor:
                     else:
                         self.hilite(2)
                         self.wr(l[1])
-                        self.wr(" ")
+                        if len(l[1]) < Editor.width:
+                            self.wr(" ")
                         self.hilite(0)
                     if len(l[1]) < Editor.width:
                         self.clear_to_eol()
+                    Editor.scrpos = (
+                        (c, len(l[1])) if flag == 0 and len(l[1]) < Editor.width else None
+                    )
+                    if flag and len(l[1]) >= Editor.width - 1:
+                        l = (False, "\x00")
                     Editor.scrbuf[c] = l
                 line += 1
         self.goto(Editor.height, 0)
         self.hilite(1)
-        self.wr(
-            Editor.TERMCMD[14 if Editor.width > 40 else 15].format(
-                chd=self.changed,
-                file=self.fname,
-                row=self.cur_line + 1,
-                total=self.total_lines,
-                col=self.vcol + 1,
-                msg=self.message,
-            )[: self.width - 1]
-        )
+        status = Editor.TERMCMD[14 if Editor.width > 40 else 15].format(
+            chd=self.changed,
+            file=self.fname,
+            row=self.cur_line + 1,
+            total=self.total_lines,
+            col=self.vcol + 1,
+            msg=self.message,
+        )[: self.width - 1]
+        self.wr(status)
+        Editor.scrpos = (Editor.height, len(status))
         self.clear_to_eol()
         self.hilite(0)
         self.goto(self.row, self.vcol - self.margin)
@@ -380,7 +955,7 @@ class Editor:
         res = self.mark_range()
         return (res[0], res[2]) if res[3] > 0 else (res[0], res[2] - 1)
     def line_edit(
-        self, prompt, default, zap=None
+        self, prompt, default, zap=None, step=None
     ):
         def push_msg(msg):
             self.wr(msg + Editor.TERMCMD[13] * len(msg))
@@ -389,13 +964,28 @@ class Editor:
         self.wr(prompt)
         self.wr(default)
         self.clear_to_eol()
+        Editor.scrpos = None
         res = default
         pos = len(res)
         del_all = True
         mouse_last = None
+        last = res
+        pending = getattr(self.io_device, "pending", None)
         while True:
+            if step is not None and res != last and not (pending and pending()):
+                last = res
+                step(res)
+                self.goto(Editor.height, 0)
+                self.hilite(1)
+                self.wr(prompt)
+                self.wr(res)
+                self.clear_to_eol()
+                Editor.scrpos = None
+                push_msg(res[pos:])
             key, char = self.get_input()
-            if key == KEY_NONE:
+            if key == KEY_BPASTE:
+                key, char = KEY_NONE, char[0][: max(0, self.width - 2 - len(prompt) - len(res))]
+            if key == KEY_NONE and char:
                 if len(prompt) + len(res) < self.width - 2:
                     res = res[:pos] + char + res[pos:]
                     self.wr(res[pos])
@@ -481,8 +1071,6 @@ class Editor:
     def move_up(self):
         if self.cur_line > 0:
             self.cur_line -= 1
-            if self.cur_line < self.top_line:
-                self.scroll_up(1)
     def skip_up(self):
         if self.col == 0 and self.cur_line > 0:
             self.col = len(self.content[self.cur_line - 1])
@@ -492,13 +1080,11 @@ class Editor:
             return False
     def move_left(self):
         self.col = self.vcol
-        if not self.skip_up():
+        if not self.skip_up() and self.col > 0:
             self.col -= 1
     def move_down(self):
         if self.cur_line < self.total_lines - 1:
             self.cur_line += 1
-            if self.cur_line == self.top_line + Editor.height:
-                self.scroll_down(1)
     def skip_down(self, l):
         if self.col >= len(l) and self.cur_line < self.total_lines - 1:
             self.col = 0
@@ -511,10 +1097,8 @@ class Editor:
             self.col += 1
     def find_in_file(self, pattern, col, end):
         Editor.find_pattern = pattern
-        if Editor.case != "y":
-            pattern = pattern.lower()
         try:
-            rex = re_compile(pattern)
+            rex = self.finder.compile(pattern, Editor.case)
         except Exception:
             self.message = "Invalid pattern: " + pattern
             return None
@@ -523,9 +1107,22 @@ class Editor:
             pattern[0] == "^" and col != 0
         ):
             start, col = start + 1, 0
+        self.hash_update()
+        lines, fold = self.finder.lines(self.content)
+        if rex is None:
+            text = self.finder.literal
+            for line in self.finder.candidates(self.content, start, end):
+                l = lines[line].lower() if fold else lines[line]
+                pos = l.find(text, col if line == start else 0)
+                if pos >= 0:
+                    self.cur_line = line
+                    self.col = pos
+                    return len(text)
+            self.message = Editor.find_pattern + " not found (again)"
+            return None
         for line in range(start, end):
-            l = self.content[line][col:]
-            if Editor.case != "y":
+            l = lines[line][col:]
+            if fold:
                 l = l.lower()
             match = rex.search(l)
             if match:
@@ -539,7 +1136,122 @@ class Editor:
         else:
             self.message = Editor.find_pattern + " not found (again)"
             return None
+    def match_bracket(self, pair, forward):
+        index = self.brackets.get(pair)
+        if index is None:
+            index = self.brackets[pair] = BracketIndex(pair)
+        self.hash_update()
+        index.update(self.content)
+        way = 1 if forward else -1
+        line = self.cur_line
+        col, depth = index.scan(self.content[line], self.col + way, way, 0)
+        if col < 0:
+            line, depth = (
+                index.forward(line + 1, depth) if forward else index.backward(line - 1, depth)
+            )
+            if line >= 0:
+                l = self.content[line]
+                col = index.scan(l, 0 if forward else len(l) - 1, way, depth)[0]
+        if col >= 0:
+            self.cur_line, self.col = line, col
+        else:
+            self.message = "No match"
+    def find_match(self, pat, lo, col):
+        if self.finder.rex is None:
+            pos = lo.find(self.finder.literal, col)
+            return None if pos < 0 else (pos, len(self.finder.literal))
+        match = self.finder.rex.search(lo[col:])
+        if not match:
+            return None
+        if pat[-1:] == "$" and match.group(0)[-1:] != "$":
+            return len(lo) - len(match.group(0)), len(match.group(0))
+        return col + lo[col:].find(match.group(0)), len(match.group(0))
+    def line_spans(self, l):
+        if self.span_key != self.finder.key or len(self.span_cache) > 4 * Editor.height:
+            self.span_key, self.span_cache = self.finder.key, {}
+        spans = self.span_cache.get(l)
+        if spans is None:
+            pat, lo, col = Editor.find_pattern, l if Editor.case == "y" else l.lower(), 0
+            spans = []
+            while col <= len(l) and (pat[0] != "^" or col == 0):
+                match = self.find_match(pat, lo, col)
+                if match is None:
+                    break
+                if match[1]:
+                    spans.append((match[0], match[0] + match[1]))
+                col = match[0] + match[1] + (match[1] == 0)
+            self.span_cache[l] = spans
+        return spans
+    def find_step(self, pat):
+        self.cur_line, self.col = self.find_from
+        if pat not in self.found:
+            try:
+                plain = self.finder.compile(pat, Editor.case) is None
+            except Exception:
+                plain = False
+            place = self.found.get(pat[:-1], False) if plain and len(pat) > 1 else False
+            if place is None:
+                self.found[pat] = None
+            else:
+                start = self.col + 1
+                if place:
+                    self.cur_line, start = place[0], place[1]
+                n = self.find_in_file(pat, start, self.total_lines) if pat else None
+                self.found[pat] = None if n is None else (self.cur_line, self.col, n)
+        place = self.found[pat]
+        if place is None:
+            self.cur_line, self.col = self.find_from
+            self.mark = None
+        else:
+            self.cur_line, self.col = place[0], place[1]
+            self.mark = (place[0], place[1] + place[2])
+        self.display_window()
+    def replace_all(self, pat, rpat, end_line, end_col, chain):
+        rex = self.finder.compile(pat, Editor.case)
+        text = self.finder.literal
+        start, col = self.cur_line, self.col
+        self.hash_update()
+        lines, fold = self.finder.lines(self.content)
+        count = 0
+        new = []
+        for line in self.finder.candidates(self.content, start, end_line):
+            l = self.content[line]
+            lo = lines[line].lower() if fold else lines[line]
+            if line != start:
+                col = 0
+            if rex is None and Editor.case == "y" and line != end_line - 1:
+                n = l.count(text, col)
+                if n:
+                    count += n
+                    new.append((line, l[:col] + l[col:].replace(text, rpat)))
+                continue
+            parts, done, shift = [], 0, 0
+            while col <= len(l) and (pat[0] != "^" or col == 0):
+                match = self.find_match(pat, lo, col)
+                if match is None:
+                    break
+                pos, ni = match
+                if line == end_line - 1 and pos + shift >= end_col:
+                    break
+                parts += [l[done:pos], rpat]
+                done = pos + ni
+                shift += len(rpat) - ni
+                col = done + (ni == 0)
+                count += 1
+            if parts:
+                new.append((line, "".join(parts) + l[done:]))
+        if new:
+            old = {}
+            for line, l in new:
+                self.hash_mark(line, [self.content[line]])
+                old[line] = self.content[line]
+                self.content[line] = l
+            self.changed = "*"
+            self.undo.append([new[0][0], 1, old, KEY_NONE, self.col, chain])
+            self.redo.clear()
+        return count
     def undo_add(self, lnum, text, key, span=1, chain=False):
+        self.hash_mark(lnum, text)
         if (
             len(self.undo) == 0
             or key == KEY_NONE
@@ -547,21 +1259,57 @@ class Editor:
             or self.undo[-1][0] != lnum
         ):
             self.changed = "*"
-            if len(self.undo) >= self.undo_limit:
-                del self.undo[0]
             self.undo.append([lnum, span, text, key, self.col, chain])
-            self.redo = []
+            self.redo.clear()
+    def change_line(self, pos, deleted, inserted, key, chain=False):
+        l = self.content[self.cur_line]
+        self.hash_mark(self.cur_line, [l])
+        pos = min(pos, len(l))
+        new = l[:pos] + inserted + l[pos + len(deleted) :]
+        if (
+            len(self.undo) == 0
+            or self.undo[-1][3] != key
+            or self.undo[-1][0] != self.cur_line
+            or type(self.undo[-1][2]) is not tuple
+        ):
+            self.changed = "*"
+            self.undo.append([self.cur_line, 1, (pos, deleted, inserted), key, self.col, chain])
+        else:
+            action = self.undo.pop()
+            p, d, i = action[2]
+            start = min(p, pos)
+            end = max(p + len(i), pos + len(deleted))
+            action[2] = (
+                start,
+                l[start:p] + d + l[p + len(i) : end],
+                new[start : end + len(inserted) - len(deleted)],
+            )
+            self.undo.append(action)
+        self.redo.clear()
+        self.content[self.cur_line] = new
     def undo_redo(self, undo, redo):
         chain = True
-        redo_start = len(redo)
+        done = 0
         while len(undo) > 0 and chain:
             action = undo.pop()
             if action[3] not in (KEY_INDENT, KEY_DEDENT, KEY_COMMENT):
                 self.cur_line = action[0]
             self.col = action[4]
-            if len(redo) >= self.undo_limit:
-                del redo[0]
-            if action[1] >= 0:
+            if type(action[2]) is tuple:
+                pos, deleted, inserted = action[2]
+                l = self.content[action[0]]
+                self.hash_mark(action[0], [l])
+                redo.append(action[0:2] + [(pos, inserted, deleted)] + action[3:])
+                self.content[action[0]] = l[:pos] + deleted + l[pos + len(inserted) :]
+            elif type(action[2]) is dict:
+                lines = {}
+                for lnum, l in action[2].items():
+                    self.hash_mark(lnum, [self.content[lnum]])
+                    lines[lnum] = self.content[lnum]
+                    self.content[lnum] = l
+                redo.append(action[0:2] + [lines] + action[3:])
+            elif action[1] >= 0:
+                self.hash_mark(action[0], self.content[action[0] : action[0] + action[1]])
                 redo.append(
                     action[0:1]
                     + [len(action[2])]
@@ -571,8 +1319,9 @@ class Editor:
                 if action[0] < self.total_lines:
                     self.content[action[0] : action[0] + action[1]] = action[2]
                 else:
-                    self.content += action[2]
+                    self.content[len(self.content) :] = action[2]
             else:
+                self.hash_mark(action[0], self.content[action[0] : action[0] - action[1] + 1])
                 redo.append(
                     action[0:1]
                     + [1]
@@ -584,9 +1333,10 @@ class Editor:
                 del self.content[action[0] : action[0] - action[1]]
                 self.content[action[0]] = action[2][0]
             chain = action[5]
-        if (len(redo) - redo_start) > 0:
+            done += 1
+        if done > 0:
             redo[-1][5] = True
-            redo[redo_start][5] = False
+            redo[-min(done, len(redo))][5] = False
             self.total_lines = len(self.content)
             self.changed = "" if self.hash == self.hash_buffer() else "*"
             self.clear_mark()
@@ -626,6 +1376,23 @@ class Editor:
         self.total_lines = len(self.content)
         self.cur_line = start_row
         self.clear_mark()
+    def paste(self, lines):
+        self.col = self.vcol
+        if self.mark is not None:
+            self.delete_mark(False)
+            chain = True
+        else:
+            chain = False
+        head, tail = lines[0], lines[-1]
+        lines[0] = self.content[self.cur_line][: self.col] + lines[0]
+        lines[-1] += self.content[self.cur_line][self.col :]
+        ni = 1 if len(lines) <= 1 else 1 - len(lines)
+        self.undo_add(
+            self.cur_line, [self.content[self.cur_line]], KEY_NONE, ni, chain
+        )
+        self.content[self.cur_line : self.cur_line + 1] = lines
+        lines[-1], lines[0] = tail, head
+        self.total_lines = len(self.content)
     def handle_edit_keys(self, key, char):
         l = self.content[self.cur_line]
         if key == KEY_NONE:
@@ -636,8 +1403,7 @@ class Editor:
                 chain = True
             else:
                 chain = False
-            self.undo_add(self.cur_line, [l], 0x20 if char == " " else 0x41, 1, chain)
-            self.content[self.cur_line] = l[: self.col] + char + l[self.col :]
+            self.change_line(self.col, "", char, 0x20 if char == " " else 0x41, chain)
             self.col += len(char)
             return key
         elif key == KEY_SHIFT_CTRL_LEFT:
@@ -697,8 +1463,7 @@ class Editor:
             if self.mark is not None:
                 self.delete_mark(False)
             elif self.col < len(l):
-                self.undo_add(self.cur_line, [l], KEY_DELETE)
-                self.content[self.cur_line] = l[: self.col] + l[self.col + 1 :]
+                self.change_line(self.col, l[self.col], "", KEY_DELETE)
             elif (self.cur_line + 1) < self.total_lines:
                 self.undo_add(self.cur_line, [l, self.content[self.cur_line + 1]], KEY_NONE)
                 self.content[self.cur_line] = l + (
@@ -712,8 +1477,7 @@ class Editor:
             if self.mark is not None:
                 self.delete_mark(False)
             elif self.col > 0:
-                self.undo_add(self.cur_line, [l], KEY_BACKSPACE)
-                self.content[self.cur_line] = l[: self.col - 1] + l[self.col :]
+                self.change_line(self.col - 1, l[self.col - 1], "", KEY_BACKSPACE)
                 self.col -= 1
             elif self.cur_line > 0:
                 self.undo_add(self.cur_line - 1, [self.content[self.cur_line - 1], l], KEY_NONE)
@@ -726,8 +1490,7 @@ class Editor:
                 pos = self.skip_while(l, self.col, Editor.word_char, 1)
                 pos += self.spaces(l[pos:])
                 if self.col < pos:
-                    self.undo_add(self.cur_line, [l], KEY_DEL_WORD)
-                    self.content[self.cur_line] = l[: self.col] + l[pos:]
+                    self.change_line(self.col, l[self.col : pos], "", KEY_DEL_WORD)
         elif key == KEY_DEL_LINE:
             if self.cur_line < (self.total_lines - 1):
                 self.undo_add(self.cur_line, [l, self.content[self.cur_line + 1]], KEY_NONE, 1)
@@ -736,6 +1499,7 @@ class Editor:
             self.content.pop(self.cur_line)
             if self.content == []:
                 self.content = [""]
+            self.total_lines = len(self.content)
         elif key == KEY_HOME:
             self.col = self.spaces(l) if self.col == 0 else 0
         elif key == KEY_END:
@@ -747,11 +1511,26 @@ class Editor:
         elif key == KEY_PGDN:
             self.cur_line += Editor.height
         elif key == KEY_FIND:
-            pat = self.line_edit("Find: ", Editor.find_pattern, "_")
+            find_pattern, top_line, mark = Editor.find_pattern, self.top_line, self.mark
+            self.find_from, self.found = (self.cur_line, self.col), {}
+            pat = self.line_edit("Find: ", Editor.find_pattern, "_", self.find_step)
+            self.cur_line, self.col = self.find_from
+            self.top_line = top_line
+            place = self.found.get(pat)
+            self.found = None
             if pat:
                 self.clear_mark()
-                self.find_in_file(pat, self.col + 1, self.total_lines)
+                if place:
+                    self.cur_line, self.col = place[0], place[1]
+                    self.find_in_file(pat, self.col, self.total_lines)
+                else:
+                    self.find_in_file(pat, self.col + 1, self.total_lines)
                 self.row = Editor.height >> 1
+            else:
+                Editor.find_pattern, self.mark = find_pattern, mark
+                self.message = ""
+        elif key == KEY_FIND_SHOW:
+            Editor.find_show = not Editor.find_show
         elif key == KEY_FIND_AGAIN:
             if Editor.find_pattern:
                 self.find_in_file(Editor.find_pattern, self.col + 1, self.total_lines)
@@ -799,46 +1578,17 @@ class Editor:
             if self.top_line > 0:
                 self.top_line = max(self.top_line - ni, 0)
                 self.cur_line = min(self.cur_line, self.top_line + Editor.height - 1)
-                self.scroll_up(ni)
         elif key == KEY_SCRLDN:
             ni = 1 if char is None else 3
             if self.top_line + Editor.height < self.total_lines:
                 self.top_line = min(self.top_line + ni, self.total_lines - 1)
                 self.cur_line = max(self.cur_line, self.top_line)
-                self.scroll_down(ni)
         elif key == KEY_MATCH:
             if self.col < len(l):
                 brackets = "<{[()]}>"
-                srch = l[self.col]
-                i = brackets.find(srch)
+                i = brackets.find(l[self.col])
                 if i >= 0:
-                    match = brackets[7 - i]
-                    level = 0
-                    way = 1 if i < 4 else -1
-                    i = self.cur_line
-                    c = self.col + way
-                    lstop = (
-                        min(self.total_lines, i + Editor.match_span)
-                        if way > 0
-                        else max(-1, i - Editor.match_span)
-                    )
-                    while i != lstop:
-                        l = self.content[i]
-                        cstop = len(l) if way > 0 else -1
-                        if srch in l or match in l:
-                            while c != cstop:
-                                if l[c] == match:
-                                    if level == 0:
-                                        self.cur_line, self.col = i, c
-                                        return key
-                                    else:
-                                        level -= 1
-                                elif l[c] == srch:
-                                    level += 1
-                                c += way
-                        i += way
-                        c = 0 if way > 0 else len(self.content[i]) - 1
-                    self.message = "No match in {} lines".format(abs(lstop - self.cur_line))
+                    self.match_bracket(brackets[min(i, 7 - i)] + brackets[max(i, 7 - i)], i < 4)
         elif key == KEY_MARK:
             if self.mark is None:
                 self.set_mark()
@@ -926,9 +1676,8 @@ class Editor:
         elif key == KEY_TAB:
             if self.mark is None:
                 self.col = self.vcol
-                self.undo_add(self.cur_line, [l], KEY_TAB)
                 ni = self.tab_size - self.col % self.tab_size
-                self.content[self.cur_line] = l[: self.col] + " " * ni + l[self.col :]
+                self.change_line(self.col, "", " " * ni, KEY_TAB)
                 self.col += ni
             else:
                 lrange = self.line_range()
@@ -951,8 +1700,7 @@ class Editor:
                     (self.col - 1) % self.tab_size + 1, self.spaces(l, self.col)
                 )
                 if ni > 0:
-                    self.undo_add(self.cur_line, [l], KEY_BACKTAB)
-                    self.content[self.cur_line] = l[: self.col - ni] + l[self.col :]
+                    self.change_line(self.col - ni, l[self.col - ni : self.col], "", KEY_BACKTAB)
                     self.col -= ni
             else:
                 lrange = self.line_range()
@@ -975,7 +1723,6 @@ class Editor:
                 )
                 if rpat is not None:
                     Editor.replc_pattern = rpat
-                    q = ""
                     cur_line, cur_col = self.cur_line, self.col
                     if self.mark is not None:
                         (self.cur_line, self.col, end_line, end_col) = self.mark_range()
@@ -985,17 +1732,21 @@ class Editor:
                     self.message = "Replace (yes/No/all/quit) ? "
                     chain = False
                     while True:
+                        line, col = self.cur_line, self.col
                         ni = self.find_in_file(pat, self.col, end_line)
                         if ni is not None and (
                             self.cur_line != (end_line - 1) or self.col < end_col
                         ):
-                            if q != "a":
-                                self.display_window()
-                                key, char = self.get_input()
-                                q = char.lower()
+                            self.display_window()
+                            key, char = self.get_input()
+                            q = char.lower()
                             if q == "q" or key == KEY_QUIT:
                                 break
-                            elif q in ("a", "y"):
+                            elif q == "a":
+                                self.cur_line, self.col = line, col
+                                count += self.replace_all(pat, rpat, end_line, end_col, chain)
+                                break
+                            elif q == "y":
                                 self.undo_add(
                                     self.cur_line,
                                     [self.content[self.cur_line]],
@@ -1038,26 +1789,15 @@ class Editor:
             self.col = col
         elif key == KEY_PASTE:
             if Editor.yank_buffer:
-                self.col = self.vcol
-                if self.mark is not None:
-                    self.delete_mark(False)
-                    chain = True
-                else:
-                    chain = False
-                head, tail = Editor.yank_buffer[0], Editor.yank_buffer[-1]
-                Editor.yank_buffer[0] = (
-                    self.content[self.cur_line][: self.col] + Editor.yank_buffer[0]
-                )
-                Editor.yank_buffer[-1] += self.content[self.cur_line][self.col :]
-                ni = 1 if len(Editor.yank_buffer) <= 1 else 1 - len(Editor.yank_buffer)
-                self.undo_add(
-                    self.cur_line, [self.content[self.cur_line]], KEY_NONE, ni, chain
-                )
-                self.content[
-                    self.cur_line : self.cur_line + 1
-                ] = Editor.yank_buffer
-                Editor.yank_buffer[-1], Editor.yank_buffer[0] = tail, head
-                self.total_lines = len(self.content)
+                self.paste(Editor.yank_buffer)
+        elif key == KEY_BPASTE:
+            write_tabs = self.write_tabs
+            for i in range(len(char)):
+                char[i] = self.expandtabs(char[i])
+            self.write_tabs = write_tabs
+            self.paste(char)
+            self.col = (self.col if len(char) == 1 else 0) + len(char[-1])
+            self.cur_line += len(char) - 1
         elif key == KEY_WRITE:
             fname = self.line_edit(
                 "Save File: ", self.fname if self.is_dir is False else "", Editor.file_char
@@ -1127,7 +1867,12 @@ class Editor:
                 self.col = self.undo[self.undo_index][4]
         elif key == KEY_UNDO_YANK:
             if len(self.undo) > 0:
-                Editor.yank_buffer = self.undo[self.undo_index][2]
+                text = self.undo[self.undo_index][2]
+                if type(text) is tuple:
+                    text = [text[1] or text[2]]
+                elif type(text) is dict:
+                    text = [text[lnum] for lnum in sorted(text)]
+                Editor.yank_buffer = text
         return key
     def edit_loop(self):
         if not self.content:
@@ -1135,8 +1880,13 @@ class Editor:
         self.total_lines = len(self.content)
         os.chdir(self.work_dir)
         self.redraw(self.message == "")
+        pending = getattr(self.io_device, "pending", None)
         while True:
-            self.display_window()
+            self.display_window(pending is None or not pending())
+            if pending is not None and not self.key_pend:
+                self.hash_update()
+                while not pending() and self.finder.idle(self.content):
+                    pass
             key, char = self.get_input()
             self.message = ""
             key = self.handle_edit_keys(key, char)
@@ -1151,9 +1901,10 @@ class Editor:
                 Editor.place_index = 0
                 self.scroll_region(0)
                 self.mouse_reporting(False)
+                self.paste_mode(False)
                 self.goto(Editor.height, 0)
                 self.clear_to_eol()
-                self.undo = []
+                self.undo.clear()
                 return key
             elif key == KEY_NEXT or key == KEY_PREV or type(key) is Editor:
                 return key
@@ -1173,9 +1924,31 @@ class Editor:
                 sb.write(c)
         return sb.getvalue()
     def hash_buffer(self):
+        self.hash_update()
+        return self.hash_now
+    def hash_mark(self, lnum, lines):
+        self.hash_update()
+        self.hash_pend = (lnum, lines, len(self.content))
+    def hash_update(self):
+        if self.hash_pend is not None:
+            lnum, old, total = self.hash_pend
+            self.hash_pend = None
+            new = self.content[lnum : lnum + len(old) + len(self.content) - total]
+            nxt = lnum + len(new)
+            self.finder.changed(lnum, len(old), new)
+            for index in self.brackets.values():
+                index.changed(lnum, len(old), new)
+            self.hash_now = (
+                self.hash_now - self.hash_pairs(lnum, old, nxt) + self.hash_pairs(lnum, new, nxt)
+            ) & 0x3FFFFFFF
+    def hash_pairs(self, lnum, lines, nxt):
         res = 0
-        for line in self.content:
-            res = ((res * 227 + 1) ^ hash(line)) & 0x3FFFFFFF
+        h = hash(self.content[lnum - 1]) if lnum > 0 else 0
+        if nxt < len(self.content):
+            lines = lines + [self.content[nxt]]
+        for line in lines:
+            res += ((h * 227 + 1) ^ hash(line)) & 0x3FFFFFFF
+            h = hash(line)
         return res
     def get_file(self, fname):
         if fname:
@@ -1189,6 +1962,9 @@ class Editor:
                         os.listdir(".")
                     )
                     self.is_dir = True
+                elif Editor.content_type is not None:
+                    self.write_tabs = False
+                    self.content = Editor.content_type(fname, self.expandtabs)
                 else:
                     if is_micropython:
                         with open(fname) as f:
@@ -1203,7 +1979,8 @@ class Editor:
                         i += 1
             except OSError:
                 self.message = "Error: file '" + fname + "' may not exist"
-        self.hash = self.hash_buffer()
+        self.hash = self.hash_now = 0
+        self.hash_pend = None
     def put_file(self, fname):
         tmpfile = fname + ".pyetmp"
         with open(tmpfile, "w") as f:
@@ -1283,6 +2060,8 @@ def pye_edit(content, tab_size=4, undo=50, io_device=None):
                 break
             elif key in slot:
                 index = slot.index(key)
+        except EOFError:
+            break
         except Exception as err:
             slot[index].message = "{!r}".format(err)
     Editor.yank_buffer = []
@@ -1292,6 +2071,11 @@ try:
     import usys as sys
 except Exception:
     import sys
+try:
+    import uselect as select
+except Exception:
+    import select
+from array import array
 class IO_DEVICE:
     def __init__(self):
         try:
@@ -1303,8 +2087,16 @@ class IO_DEVICE:
             self.rd_raw_fct = sys.stdin.buffer.read
         else:
             self.rd_raw_fct = sys.stdin.read
+        try:
+            self.poll = select.poll()
+            self.poll.register(sys.stdin, select.POLLIN)
+        except Exception:
+            self.poll = None
+    frame = True
     def wr(self, s):
         sys.stdout.write(s)
+    def pending(self):
+        return self.poll is not None and len(self.poll.poll(0)) > 0
     def rd(self):
         return sys.stdin.read(1)
     def rd_raw(self):
@@ -1324,7 +2116,16 @@ class IO_DEVICE:
             char = self.rd()
         return [int(i, 10) for i in pos.lstrip("\n\x1b[").split(";")]
 if "pye_edit" not in globals().keys():
-    from pye import pye_edit
+    from pye import pye_edit, is_micropython, Editor, ArrayBuffer
+if is_micropython:
+    try:
+        a = array("H", [0])
+        a[0:1] = array("H", [1, 2])
+        str(memoryview(b"ab")[0:1], "utf-8")
+        slice(0, 1).start
+        Editor.content_type = ArrayBuffer
+    except Exception:
+        pass
 def pye(*args, tab_size=4, undo=50):
     io_device = IO_DEVICE()
     ret = pye_edit(args, tab_size=tab_size, undo=undo, io_device=io_device)
@@ -0,0 +1,321 @@
+#
+# Benchmarks for pye, running with CPython or MicroPython
+#
+# import pye_bench
+# pye_bench.storage(10000)
+# pye_bench.frames()
+# pye_bench.paste()
+# pye_bench.search(10000)
+# pye_bench.index(1000000)  ## Linux only
+# pye_bench.replace(50000)
+# pye_bench.brackets(100000)
+# pye_bench.scenarios(100000)
+#
+import gc, os, sys, time
+
+try:
+    ticks_ms = time.ticks_ms
+except AttributeError:
+
+    def ticks_ms():
+        return int(time.time() * 1000)
+
+
+try:
+    from pye import ArrayBuffer, Editor, pye_edit
+except ImportError:
+    from pye_core import ArrayBuffer, Editor, pye_edit
+
+try:
+    gc.mem_free
+
+    def mem_free():
+        gc.collect()
+        return gc.mem_free()
+
+    mem_alloc = gc.mem_alloc
+
+except AttributeError:  ## CPython: use the traced memory instead
+    import tracemalloc
+
+    def mem_free():  ## starts tracing, which slows down everything else
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        gc.collect()
+        return -tracemalloc.get_traced_memory()[0]
+
+    mem_alloc = None
+
+
+def make_file(fname, lines):  ## sample text, looking like python code
+    with open(fname, "w") as f:
+        for i in range(lines):
+            f.write("{}def function_{}(a, b):  # comment {}\n".format("    " * (i % 3), i, i))
+
+
+def load_list(fname):  ## the way Editor.get_file reads a file into a list
+    with open(fname) as f:
+        content = f.readlines()
+    for i in range(len(content)):
+        content[i] = content[i].rstrip()
+    return content
+
+
+## Memory used for a file of n lines as list of strings and as ArrayBuffer
+def storage(lines=10000, fname="pye_bench.txt"):
+    make_file(fname, lines)
+    for name, load in (
+        ("list", load_list),
+        ("ArrayBuffer", lambda f: ArrayBuffer(f, lambda s: s)),
+    ):
+        before = mem_free()
+        content = load(fname)
+        after = mem_free()
+        print("{:12} {} lines: {} bytes".format(name, len(content), before - after))
+        content = None
+    os.remove(fname)
+    if "tracemalloc" in globals():
+        tracemalloc.stop()
+
+
+## io_device replaying a list of keys and counting the writes to the screen.
+## After the keys, it quits the editor, without saving the text. With
+## MicroPython it records the most memory allocated when reading a key.
+class ScriptIO:
+    quit = "\x11\x1b[3~f\r"  ## Quit, delete the default answer, force
+
+    def __init__(self, keys, frame=False, size=(24, 80)):
+        self.keys = "".join(keys)
+        self.pos = 0
+        self.frame = frame
+        self.size = size
+        self.writes = self.bytes = 0
+        self.peak = 0
+
+    def wr(self, s):
+        self.writes += 1
+        self.bytes += len(s)
+
+    def rd(self):
+        if mem_alloc is not None:
+            self.peak = max(self.peak, mem_alloc())
+        self.pos += 1
+        if self.pos > len(self.keys):
+            return ScriptIO.quit[(self.pos - len(self.keys) - 1) % len(ScriptIO.quit)]
+        return self.keys[self.pos - 1]
+
+    def rd_raw(self):
+        return self.rd().encode()
+
+    def get_screen_size(self):
+        return list(self.size)
+
+    def deinit_tty(self):
+        pass
+
+
+## the same, telling the editor about the keys still waiting
+class TypeAheadIO(ScriptIO):
+    def pending(self):
+        return self.pos < len(self.keys)
+
+
+## typing, cursor and page moves, marking lines and quitting without saving
+def session():
+    return (
+        ["x"] * 20
+        + ["\x1b[B"] * 30
+        + ["\x1b[6~"] * 5
+        + ["\x1b[5~"] * 5
+        + ["\x1b[1;2B"] * 10
+        + ["\x11", "\x1b[3~", "y", "\r"]  ## Del removes the default answer
+    )
+
+
+## Writes per frame, i.e. per key, with and without composing the frame
+## in display_window. Each write is a system call with the Linux version.
+def frames(lines=1000):
+    keys = session()
+    content = ["{}def function_{}(a, b):".format("    " * (i % 3), i) for i in range(lines)]
+    for frame in (False, True):
+        io = ScriptIO(keys, frame)
+        pye_edit((content,), io_device=io)
+        print(
+            "frame={}: {} keys, {:.1f} writes and {} bytes per frame".format(
+                frame, len(keys), io.writes / len(keys), io.bytes // len(keys)
+            )
+        )
+
+
+## Pasting text as single keys or with bracketed paste. Reports the time and
+## the bytes sent to the screen, for keys also with skipping the screen updates
+## while keys are waiting.
+def paste(chars=5000):
+    text = "".join("line {} of the text to be pasted\r".format(i) for i in range(chars // 32 + 1))
+    quit = ["\x11", "\x1b[3~", "y", "\r"]
+    keys = list(text[:chars]) + quit
+    pasted = ["\x1b[200~", text[:chars], "\x1b[201~"] + quit
+    for name, io in (
+        ("keys", ScriptIO(keys)),
+        ("keys, type-ahead", TypeAheadIO(keys)),
+        ("bracketed paste", ScriptIO(pasted)),
+    ):
+        start = ticks_ms()
+        pye_edit(([""],), io_device=io)
+        print(
+            "{}: {} chars, {} ms, {} bytes written, {:.1f} s at 115200 baud".format(
+                name, chars, ticks_ms() - start, io.bytes, io.bytes / 11520
+            )
+        )
+
+
+## Searching the whole text for a string which is not there, as plain text
+## and as the same text written as regular expression, each with and without
+## ignoring the case
+def search(lines=10000, repeat=5):
+    ed = Editor(4, 50, ScriptIO([]))
+    ed.content = [
+        "{}def function_{}(a, b):  # comment {}".format("    " * (i % 3), i, i)
+        for i in range(lines)
+    ]
+    ed.total_lines = lines
+    for case in ("y", "n"):
+        Editor.case = case
+        for name, pattern in (("text", "function_x"), ("regex", "function[_]x")):
+            ed.find_in_file(pattern, 0, lines)  ## compiles and makes the lower case copy
+            start = ticks_ms()
+            for _ in range(repeat):
+                ed.cur_line, ed.col = 0, 0
+                ed.find_in_file(pattern, 0, lines)
+            print(
+                "{:5} case={}: {} lines, {:.1f} ms".format(
+                    name, case, lines, (ticks_ms() - start) / repeat
+                )
+            )
+    Editor.case = "n"
+
+
+## Find the next place of a text in a large buffer, from the top, with and
+## without the block index of the Linux version. Reports the time for building
+## the index, too, which is done while waiting for keys.
+def index(lines=1000000, repeat=5):
+    import pye_core
+
+    saved = pye_core.Editor.content_type, pye_core.Editor.finder_type
+    from pye_ux import BlockFinder  ## sets both for the Linux version, when imported first
+
+    pye_core.Editor.content_type, pye_core.Editor.finder_type = saved
+    ed = pye_core.Editor(4, 50, ScriptIO([]))  ## the Editor of BlockFinder, not the one of pye
+    ed.content = [
+        "{}def function_{}(a, b):  # comment {}".format("    " * (i % 3), i, i)
+        for i in range(lines)
+    ]
+    ed.total_lines = lines
+    pattern = "comment {}".format(lines - 10)
+    for name, finder in (("linear", ed.finder), ("index", BlockFinder())):
+        ed.finder = finder
+        start = ticks_ms()
+        while finder.idle(ed.content):
+            pass
+        built = ticks_ms() - start
+        start = ticks_ms()
+        for _ in range(repeat):
+            ed.cur_line, ed.col = 0, 0
+            ed.find_in_file(pattern, 0, lines)
+        print(
+            "{:6}: {} lines, found in line {}, {:.1f} ms, index built in {} ms".format(
+                name, lines, ed.cur_line, (ticks_ms() - start) / repeat, built
+            )
+        )
+
+
+## Replace all, of plain text and of a regular expression, in every line
+def replace(lines=50000):
+    content = [
+        "{}def function_{}(a, b):  # comment {}".format("    " * (i % 3), i, i)
+        for i in range(lines)
+    ]
+    for pattern, text in (("function", "procedure"), ("comment [0-9]+", "comment")):
+        keys = ["\x12", "\x1b[3~", pattern, "\r", "\x1b[3~", text, "\r", "a"]  ## Del: no defaults
+        keys += ["\x11", "\x1b[3~", "y", "\r"]
+        start = ticks_ms()
+        pye_edit((content,), io_device=ScriptIO(keys))
+        print("{!r} in {} lines: {} ms".format(pattern, lines, ticks_ms() - start))
+
+
+## Matching the brackets around a JSON document: the first time, when the
+## index is built, then after changing a line and after inserting a line
+def brackets(lines=100000):
+    ed = Editor(4, 50, ScriptIO([]))
+    ed.content = (
+        ["["] + ['  {{"id": {}, "tags": ["a", "b"]}},'.format(i) for i in range(lines)] + ["]"]
+    )
+    ed.total_lines = len(ed.content)
+    for name, line, text in (("build", 1, None), ("change", 1, "  {},"), ("insert", 1, "")):
+        if text is not None:
+            ed.undo_add(line, [ed.content[line]], 0)
+            ed.content[line : line + 1] = [text] if name == "change" else [text, ed.content[line]]
+        ed.cur_line, ed.col = 0, 0
+        start = ticks_ms()
+        ed.match_bracket("[]", True)
+        print(
+            "{:6}: {} lines, match in line {}, {} ms".format(
+                name, len(ed.content), ed.cur_line + 1, ticks_ms() - start
+            )
+        )
+
+
+## Running pye_edit with the keys for file fname. Returns the time, the number
+## and bytes of writes and the peak memory used. CPython needs tracemalloc for
+## the memory, which slows it down, so it runs the keys a second time for that.
+def run(fname, keys):
+    io = ScriptIO(keys)
+    gc.collect()
+    base = mem_alloc() if mem_alloc is not None else 0
+    start = ticks_ms()
+    pye_edit([fname], io_device=io)
+    result = [ticks_ms() - start, io.writes, io.bytes, io.peak - base]
+    if mem_alloc is None:
+        tracemalloc.start()
+        pye_edit([fname], io_device=ScriptIO(keys))
+        result[3] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+
+## The standard scenarios for a file of the given size: opening it, paging
+## through it, pasting 10000 lines, replacing a word in every line, undoing
+## both changes and saving the file. Each starts with opening the file.
+def scenarios(lines=100000, fname="pye_bench.txt"):
+    make_file(fname, lines)
+    text = "".join("line {} of the text to be pasted\r".format(i) for i in range(10000))
+    paste = ["\x1b[200~", text, "\x1b[201~"]
+    replace = ["\x12", "\x1b[3~", "function", "\r", "\x1b[3~", "procedure", "\r", "a"]
+    for name, keys in (
+        ("open", []),
+        ("page", ["\x1b[6~"] * (lines // 23 + 1)),
+        ("paste", paste),
+        ("replace", replace),
+        ("undo", paste + replace + ["\x1a"] * 3),
+        ("save", ["x", "\x13", "\r"]),
+    ):
+        print(
+            "{:8} {} lines: {} ms, {} writes, {} bytes written, {} bytes memory".format(
+                name, lines, *run(fname, keys)
+            )
+        )
+    os.remove(fname)
+
+
+if __name__ == "__main__":
+    storage()
+    frames()
+    paste()
+    search(10000)
+    replace()
+    brackets(10000)
+    scenarios(10000)
+    if sys.implementation.name != "micropython":  ## needs too much memory
+        search(1000000, 1)
+        index(1000000)
+        scenarios(100000)
@@ -19,7 +19,7 @@
 ## - Added multi-file support
 ##
 
-PYE_VERSION = " V2.80 "
+PYE_VERSION = " V2.81 "
 try:
     import usys as sys
 except Exception:
@@ -39,6 +39,7 @@ else:
         return x
 
 from re import compile as re_compile
+from array import array
 import time
 
 KEY_NONE = const(0x00)
@@ -102,6 +103,418 @@ KEY_PREV_PLACE = const(0xFFE2)
 KEY_UNDO_PREV = const(0xFFE1)
 KEY_UNDO_NEXT = const(0xFFE0)
 KEY_UNDO_YANK = const(0xFFDF)
+KEY_BPASTE = const(0xFFDE)
+KEY_FIND_SHOW = const(0xFFDD)
+
+
+## Base class for alternative line storages, which behave like the list of strings
+## in Editor.content as far as the editor uses it. A subclass provides line(i),
+## splice(start, stop, lines) and the number of lines in self.total.
+## Slices are returned as plain lists.
+class LineBuffer:
+    def __len__(self):
+        return self.total
+
+    def pos(self, i):  ## index -> line number, like list indexing does
+        if i < 0:
+            i += self.total
+        if not 0 <= i < self.total:
+            raise IndexError
+        return i
+
+    def bounds(self, s):  ## slice -> start, stop, clipped to the buffer
+        start = min(s.start or 0, self.total)
+        return start, max(start, self.total if s.stop is None else min(s.stop, self.total))
+
+    def __getitem__(self, i):
+        if type(i) is int:
+            return self.line(self.pos(i))
+        start, stop = self.bounds(i)
+        return [self.line(j) for j in range(start, stop)]
+
+    def __setitem__(self, i, lines):
+        if type(i) is int:
+            i = self.pos(i)
+            self.splice(i, i + 1, [lines])
+        else:
+            start, stop = self.bounds(i)
+            self.splice(start, stop, lines)
+
+    def __delitem__(self, i):
+        if type(i) is int:
+            i = self.pos(i)
+            self.splice(i, i + 1, [])
+        else:
+            start, stop = self.bounds(i)
+            self.splice(start, stop, [])
+
+    def __iadd__(self, lines):
+        self.splice(self.total, self.total, lines)
+        return self
+
+    def __iter__(self):
+        for i in range(self.total):
+            yield self.line(i)
+
+    def __eq__(self, other):
+        return len(other) == self.total and list(self) == list(other)
+
+    def pop(self, i):
+        l = self[i]
+        del self[i]
+        return l
+
+
+## Compact line storage for devices with a small heap: the lines are stored utf-8
+## encoded in a single bytearray, and an array holds the start and end offset of
+## each line, avoiding a string object per line. Lines are decoded on access.
+## Replaced lines are stored in place if they fit, otherwise appended, and the
+## unused space is reclaimed once it exceeds half of the bytearray.
+class ArrayBuffer(LineBuffer):
+    def __init__(self, fname, expandtabs):
+        self.text = bytearray()
+        self.ofs = array("H")  ## start, end offsets; switched to "I" beyond 64k
+        self.wide = False
+        self.spare = 0  ## unused bytes in text
+        self.total = 0
+        with open(fname) if is_micropython else open(fname, errors="ignore") as f:
+            for l in f:
+                self.splice(self.total, self.total, [expandtabs(l.rstrip())])
+
+    def line(self, i):
+        return str(memoryview(self.text)[self.ofs[2 * i] : self.ofs[2 * i + 1]], "utf-8")
+
+    def splice(self, start, stop, lines):
+        if stop - start == 1 == len(lines):  ## replace a single line
+            b = lines[0].encode()
+            i = 2 * start
+            if self.ofs[i + 1] == len(self.text):  ## the last one in text: resize it
+                self.text[self.ofs[i] :] = b
+            elif len(b) <= self.ofs[i + 1] - self.ofs[i]:  ## fits into the old place
+                self.spare += self.ofs[i + 1] - self.ofs[i] - len(b)
+                self.text[self.ofs[i] : self.ofs[i] + len(b)] = b
+            else:
+                self.spare += self.ofs[i + 1] - self.ofs[i]
+                self.text += b
+                self.widen()
+                self.ofs[i] = len(self.text) - len(b)
+            self.widen()
+            self.ofs[i + 1] = self.ofs[i] + len(b)
+        else:
+            new = []
+            for l in lines:
+                new.append(len(self.text))
+                self.text += l.encode()
+                new.append(len(self.text))
+            for i in range(2 * start, 2 * stop, 2):
+                self.spare += self.ofs[i + 1] - self.ofs[i]
+            self.widen()
+            self.ofs[2 * start : 2 * stop] = array("I" if self.wide else "H", new)
+            self.total += len(lines) - (stop - start)
+        if self.spare > 256 and self.spare > len(self.text) >> 1:
+            self.compact()
+
+    def widen(self):  ## switch to 32 bit offsets when text grows beyond 64k
+        if not self.wide and len(self.text) > 0xFFFF:
+            self.ofs = array("I", self.ofs)
+            self.wide = True
+
+    def compact(self):  ## copy the lines into a new bytearray, dropping unused space
+        text = bytearray()
+        old = memoryview(self.text)
+        for i in range(0, 2 * self.total, 2):
+            start = len(text)
+            text += old[self.ofs[i] : self.ofs[i + 1]]
+            self.ofs[i] = start
+            self.ofs[i + 1] = len(text)
+        self.text = text
+        self.spare = 0
+
+
+## Ring buffer for the undo and redo records. It holds at most limit records and,
+## if budget is not 0, at most about budget bytes of saved text. When full, the
+## oldest records are dropped. Besides append and pop, it supports len() and
+## indexing, with negative indices counting from the newest record.
+class UndoRing:
+    def __init__(self, limit, budget=0):
+        self.ring = [None] * limit
+        self.size = [0] * limit  ## saved text size of each record
+        self.limit = limit
+        self.budget = budget
+        self.first = self.count = self.bytes = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError
+        return self.ring[(self.first + i) % self.limit]
+
+    def append(self, action):
+        if type(action[2]) is tuple:  ## change within a line: pos, deleted, inserted
+            size = len(action[2][1]) + len(action[2][2])
+        elif type(action[2]) is dict:  ## lines changed in place: lnum -> text
+            size = len(action[2])
+            for l in action[2].values():
+                size += len(l)
+        else:
+            size = len(action[2])  ## count a line end for each line
+            for l in action[2]:
+                size += len(l)
+        while self.count > 0 and (
+            self.count >= self.limit or (self.budget and self.bytes + size > self.budget)
+        ):  ## drop the oldest, but always keep the new one
+            self.bytes -= self.size[self.first]
+            self.ring[self.first] = None
+            self.first = (self.first + 1) % self.limit
+            self.count -= 1
+        i = (self.first + self.count) % self.limit
+        self.ring[i] = action
+        self.size[i] = size
+        self.bytes += size
+        self.count += 1
+
+    def pop(self):
+        if self.count == 0:
+            raise IndexError
+        self.count -= 1
+        i = (self.first + self.count) % self.limit
+        action = self.ring[i]
+        self.ring[i] = None
+        self.bytes -= self.size[i]
+        return action
+
+    def clear(self):
+        while self.count > 0:
+            self.pop()
+        self.first = 0
+
+
+## Search engine of an Editor. It keeps the compiled pattern, and for searching
+## with the case ignored a lower case copy of the lines, if they are a list. The
+## copy is made by the first search and updated for the lines changed after that.
+## Patterns without regex meta characters are searched for with str.find().
+class Finder:
+    def __init__(self):
+        self.key = None  ## pattern and case of rex
+        self.rex = None
+        self.literal = None  ## the pattern, if it is plain text
+        self.content = None
+        self.lower = None  ## lower case copy of content
+
+    def compile(self, pattern, case):
+        if (pattern, case) != self.key:
+            self.key = None
+            text = pattern if case == "y" else pattern.lower()
+            for c in text:
+                if c in ".^$*+?{}[]()|\\":
+                    self.rex, self.literal = re_compile(text), None
+                    break
+            else:
+                self.rex, self.literal = None, text
+            self.key = (pattern, case)
+        return self.rex
+
+    def lines(self, content):  ## the lines to be searched, and whether to lower them
+        if self.key[1] == "y":
+            return content, False
+        if type(content) is not list or len(content) > Editor.lower_lines:
+            ## a line storage, which decodes lines on access, or too large for a copy
+            self.lower = None
+            return content, True
+        if content is not self.content or self.lower is None or len(self.lower) != len(content):
+            self.content = content
+            self.lower = [l.lower() for l in content]
+        return self.lower, False
+
+    def changed(self, lnum, old, new):  ## lines lnum to lnum + old replaced by new lines
+        if self.lower is not None:
+            self.lower[lnum : lnum + old] = [l.lower() for l in new]
+
+    def candidates(self, content, start, end):  ## the lines which may hold the plain text
+        return range(start, end)
+
+    def idle(self, content):  ## do some work while waiting for keys, tell if there is more
+        return False
+
+
+## Index for matching one kind of brackets. For each line it keeps the number of
+## opening minus closing brackets and the lowest value of that count along the
+## line. The lines are split into blocks, and a segment tree sums up the blocks,
+## telling which block, and then which line of it, holds the match. Changed lines
+## are counted again when the index is used the next time. Inserted and deleted
+## lines change the size of their block only, until a block gets too large.
+class BracketIndex:
+    block_lines = 128
+
+    def __init__(self, pair):
+        self.pair = pair  ## opening and closing bracket
+        self.content = None
+        self.lines = []  ## (net, low) of each line, None if changed
+        self.starts = None  ## first line of each block, and the number of lines
+        self.dirty = set()  ## blocks with changed lines
+        self.size = 0
+        self.net = self.low = None  ## the segment tree, leaves at size + block
+
+    def count(self, l):
+        net = l.count(self.pair[0]) - l.count(self.pair[1])
+        if l.rfind(self.pair[0]) < l.find(self.pair[1]) or self.pair[1] not in l:
+            return (net, min(net, 0))  ## no opening bracket after a closing one
+        net = low = 0
+        for c in l:
+            if c == self.pair[0]:
+                net += 1
+            elif c == self.pair[1]:
+                net -= 1
+                low = min(low, net)
+        return (net, low)
+
+    def block(self, lnum):  ## the block holding line lnum
+        k, hi = 0, len(self.starts) - 1
+        while hi - k > 1:
+            mid = (k + hi) >> 1
+            if self.starts[mid] <= lnum:
+                k = mid
+            else:
+                hi = mid
+        return k
+
+    def changed(self, lnum, old, new):  ## lines lnum to lnum + old replaced by new lines
+        self.lines[lnum : lnum + old] = [None] * len(new)
+        if self.starts is not None:
+            k = self.block(lnum)
+            m = self.block(lnum + old - 1) if old > 1 else k
+            self.dirty.update(range(k, m + 1))
+            starts, delta = self.starts, len(new) - old
+            for j in range(k + 1, m + 1):  ## the blocks in between get empty
+                starts[j] = lnum + len(new)
+            if delta:
+                starts[m + 1 :] = [s + delta for s in starts[m + 1 :]]
+                if starts[k + 1] - starts[k] > 4 * BracketIndex.block_lines:
+                    self.starts = None  ## split it up again
+
+    def update(self, content):
+        if content is not self.content or len(self.lines) != len(content):
+            self.content = content
+            self.lines = [None] * len(content)
+            self.starts = None
+        lines = self.lines
+        if self.starts is None:  ## build the tree
+            self.starts = list(range(0, len(content), BracketIndex.block_lines))
+            self.starts.append(len(content))
+            self.size = 1
+            while self.size < len(self.starts) - 1:
+                self.size <<= 1
+            self.net = array("i", [0] * (2 * self.size))
+            self.low = array("i", [0] * (2 * self.size))
+            self.dirty = range(len(self.starts) - 1)
+        net, low = self.net, self.low
+        for b in self.dirty:  ## count the lines of the block and sum them up
+            n = lo = 0
+            for i in range(self.starts[b], self.starts[b + 1]):
+                if lines[i] is None:
+                    lines[i] = self.count(content[i])
+                lo = min(lo, n + lines[i][1])
+                n += lines[i][0]
+            k = b + self.size
+            net[k], low[k] = n, lo
+            if type(self.dirty) is set:
+                k >>= 1
+                while k:  ## sum up
+                    net[k] = net[2 * k] + net[2 * k + 1]
+                    low[k] = min(low[2 * k], net[2 * k] + low[2 * k + 1])
+                    k >>= 1
+        if type(self.dirty) is not set:
+            for k in range(self.size - 1, 0, -1):
+                net[k] = net[2 * k] + net[2 * k + 1]
+                low[k] = min(low[2 * k], net[2 * k] + low[2 * k + 1])
+        self.dirty = set()
+
+    ## The first line from line on, in which depth, the number of open brackets,
+    ## drops below 0, and the depth at its start. -1, if there is none.
+    def forward(self, line, depth):
+        if line >= len(self.lines):
+            return -1, depth
+        b = self.block(line)
+        line, depth = self.forward_lines(line, self.starts[b + 1], depth)
+        if line >= 0 or b + 1 >= self.size:
+            return line, depth
+        k = b + 1 + self.size
+        while depth + self.low[k] >= 0:  ## not in this subtree, go to the next one
+            depth += self.net[k]
+            while k & 1:
+                k >>= 1
+            if k == 0:
+                return -1, depth
+            k += 1
+        while k < self.size:  ## the leftmost leaf of the subtree with the match
+            if depth + self.low[2 * k] < 0:
+                k = 2 * k
+            else:
+                depth += self.net[2 * k]
+                k = 2 * k + 1
+        b = k - self.size
+        return self.forward_lines(self.starts[b], self.starts[b + 1], depth)
+
+    def forward_lines(self, line, end, depth):  ## the same for the lines up to end
+        while line < end:
+            net, low = self.lines[line]
+            if depth + low < 0:
+                return line, depth
+            depth += net
+            line += 1
+        return -1, depth
+
+    ## The same backwards from line on, with depth being the number of closing brackets
+    def backward(self, line, depth):
+        if line < 0:
+            return -1, depth
+        b = self.block(line)
+        line, depth = self.backward_lines(line, self.starts[b], depth)
+        if line >= 0 or b == 0:
+            return line, depth
+        k = b - 1 + self.size
+        while self.net[k] - self.low[k] <= depth:
+            depth -= self.net[k]
+            while not k & 1:
+                k >>= 1
+            if k == 1:
+                return -1, depth
+            k -= 1
+        while k < self.size:
+            if self.net[2 * k + 1] - self.low[2 * k + 1] > depth:
+                k = 2 * k + 1
+            else:
+                depth -= self.net[2 * k + 1]
+                k = 2 * k
+        b = k - self.size
+        return self.backward_lines(self.starts[b + 1] - 1, self.starts[b], depth)
+
+    def backward_lines(self, line, start, depth):  ## the same for the lines down to start
+        while line >= start:
+            net, low = self.lines[line]
+            if net - low > depth:
+                return line, depth
+            depth -= net
+            line -= 1
+        return -1, depth
+
+    ## The place in line l from col on, where depth drops below 0, going the way
+    ## 1 or -1, or -1 and the depth at the end of the line.
+    def scan(self, l, col, way, depth):
+        stop = len(l) if way > 0 else -1
+        while col != stop:
+            if l[col] == self.pair[0]:
+                depth += way
+            elif l[col] == self.pair[1]:
+                depth -= way
+            if depth < 0:
+                return col, depth
+            col += way
+        return -1, depth
 
 
 class Editor:
@@ -177,6 +590,9 @@ class Editor:
         "\x1b[6;3~": KEY_NEXT_PLACE,  ## Alt-PgDn
         "\x1b[1;3H": KEY_UNDO_PREV,  ## Alt-Home
         "\x1b[1;3F": KEY_UNDO_NEXT,  ## Alt-End
+        "\x1b[200~": KEY_BPASTE,  ## start of bracketed paste
+        "\x1bOR": KEY_FIND_SHOW,  ## F3
+        "\x1b[13~": KEY_FIND_SHOW,  ## F3 with Putty
     }
 
     TERMCMD = [  ## list of terminal control strings
@@ -198,6 +614,16 @@ class Editor:
         "{chd}{file} Row: {row}/{total} Col: {col}  {msg}",
         ## 15: Shorter status line format string.
         "{chd}{file} {row}:{col}  {msg}",
+        "\x1b[?2004h",  ## 16: Bracketed paste on
+        "\x1b[?2004l",  ## 17: Bracketed paste off
+        "\x1b[46m",  ## 18: Hilite 3 - Matches of the find pattern
+        "\x1b[{n}@",  ## 19: Insert n blank characters, empty if not supported
+        "\x1b[{n}P",  ## 20: Delete n characters, empty if not supported
+        "\x1b[{n}L",  ## 21: Insert n blank lines, empty if not supported
+        "\x1b[{n}M",  ## 22: Delete n lines, empty if not supported
+        "\x1b[{n}A",  ## 23: Cursor n rows up, empty if relative moves are not supported
+        "\x1b[{n}C",  ## 24: Cursor n columns right
+        "\x1b[{n}D",  ## 25: Cursor n columns left
     ]
 
     ## symbols that are shared between instances of Editor
@@ -206,37 +632,71 @@ class Editor:
     case = "n"
     autoindent = "y"
     replc_pattern = ""
+    find_show = False  ## highlight the matches of find_pattern on the screen
+    scrtop = None  ## top_line and margin of the text in scrbuf
+    scrpos = None  ## row and column of the cursor on the screen, if known
     comment_char = "\x23 "  ## for #
     word_char = "_\\"  ## additional characters in a word
     file_char = "_.-"  # additional characters in a file name
-    match_span = 50  ## number of lines to search for a bracket match
     place_list = []  ##
     place_index = 0
     max_places = 20
+    content_type = None  ## alternative line storage for files, e.g. a LineBuffer subclass
+    undo_budget = 0  ## max. bytes of text in the undo and redo records, 0 = no limit
+    key_trie = None  ## KEYMAP compiled by compile_keys()
+    key_map = None  ## a copy of KEYMAP when compiled, to find changed bindings
+    lower_lines = 0 if is_micropython else 200000  ## max. lines with a lower case copy for find
+    finder_type = Finder  ## search engine, e.g. a Finder subclass with an index of the lines
 
     def __init__(self, tab_size, undo_limit, io_device):
         self.top_line = self.cur_line = self.row = self.vcol = self.col = self.margin = 0
         self.tab_size = tab_size
         self.changed = ""
-        self.hash = 0
+        self.hash = self.hash_now = 0
+        self.hash_pend = None
+        self.finder = Editor.finder_type()
+        self.span_key = None  ## pattern and case of the span_cache
+        self.span_cache = {}  ## line text -> spans of the matches in it
+        self.brackets = {}  ## BracketIndex for each kind of brackets matched
         self.message = self.fname = ""
         self.content = [""]
-        self.undo = []
+        self.undo = UndoRing(undo_limit, Editor.undo_budget)
         self.undo_limit = undo_limit
         self.undo_index = 0
-        self.redo = []
+        self.redo = UndoRing(undo_limit, Editor.undo_budget)
         self.clear_mark()
         self.write_tabs = "n"
         self.work_dir = os.getcwd()
         self.io_device = io_device
         self.wr = io_device.wr
         self.is_dir = False
-        self.key_max = 0
-        for _ in Editor.KEYMAP.keys():
-            self.key_max = max(self.key_max, len(_))
+        self.key_pend = ""
+        if Editor.KEYMAP != Editor.key_map:  ## new or changed KEYMAP
+            self.compile_keys()
 
-    def goto(self, row, col):
-        self.wr(Editor.TERMCMD[0].format(row=row + 1, col=col + 1))
+    def goto(self, row, col):  ## the shortest way from the cursor position, if known
+        pos, Editor.scrpos = Editor.scrpos, (row, col)
+        if pos == (row, col):
+            return
+        cmd = Editor.TERMCMD[0].format(row=row + 1, col=col + 1)
+        if pos is not None and Editor.TERMCMD[23] and (row <= pos[0] or row < Editor.height):
+            r, c = pos  ## newlines are used only where they do not scroll
+            if row < r:
+                move = Editor.TERMCMD[23].format(n=r - row)
+            elif row > r:
+                move, c = "\r" + "\n" * (row - r), 0
+            else:
+                move = ""
+            if col == 0 and c > 0:
+                move += "\r"
+            elif col > c:
+                move += Editor.TERMCMD[24].format(n=col - c)
+            elif col < c:
+                left = Editor.TERMCMD[25].format(n=c - col)
+                move += left if len(left) < c - col else Editor.TERMCMD[13] * (c - col)
+            if len(move) < len(cmd):
+                cmd = move
+        self.wr(cmd)
 
     def clear_to_eol(self):
         self.wr(Editor.TERMCMD[1])
@@ -249,6 +709,8 @@ class Editor:
             self.wr(Editor.TERMCMD[5])
         elif mode == 2:  ## used for the marked area
             self.wr(Editor.TERMCMD[6])
+        elif mode == 3:  ## used for the matches of the find pattern
+            self.wr(Editor.TERMCMD[18])
         else:  ## plain text
             self.wr(Editor.TERMCMD[4])
 
@@ -257,66 +719,226 @@ class Editor:
             Editor.TERMCMD[7] if onoff else Editor.TERMCMD[8]
         )  ## enable/disable mouse reporting
 
+    def paste_mode(self, onoff):
+        self.wr(Editor.TERMCMD[16] if onoff else Editor.TERMCMD[17])
+
     def scroll_region(self, stop):
         self.wr(
             Editor.TERMCMD[11].format(stop=stop) if stop else Editor.TERMCMD[12]
         )  ## set scrolling range
+        Editor.scrpos = None  ## moves the cursor to the top, on most terminals
 
     def scroll_up(self, scrolling):
         if Editor.TERMCMD[9]:
             Editor.scrbuf[scrolling:] = Editor.scrbuf[:-scrolling]
-            Editor.scrbuf[:scrolling] = [""] * scrolling
+            Editor.scrbuf[:scrolling] = [(False, "")] * scrolling
             self.goto(0, 0)
             self.wr(Editor.TERMCMD[9] * scrolling)
 
     def scroll_down(self, scrolling):
         if Editor.TERMCMD[10]:
             Editor.scrbuf[:-scrolling] = Editor.scrbuf[scrolling:]
-            Editor.scrbuf[-scrolling:] = [""] * scrolling
+            Editor.scrbuf[-scrolling:] = [(False, "")] * scrolling
             self.goto(Editor.height - 1, 0)
             self.wr(Editor.TERMCMD[10] * scrolling)
 
+    ## Move the rows of the screen, which are shown further up or down now. After
+    ## a move of top_line the screen is scrolled by that much. Else, e.g. after
+    ## inserting or deleting lines, the first row shown elsewhere is looked up by
+    ## its text and rows are inserted or deleted above it.
+    def shift_rows(self):
+        height, top = Editor.height, self.top_line
+        scrtop, Editor.scrtop = Editor.scrtop, (top, self.margin)
+        new = [
+            self.content[line][self.margin : self.margin + Editor.width]
+            if line < self.total_lines
+            else ""
+            for line in range(top, top + height)
+        ]
+        old = [r[1] if type(r) is tuple and r[1] != "\x00" else None for r in Editor.scrbuf]
+
+        def saved(start, d):  ## bytes not written when moving the rows d rows down
+            res = 0
+            for m in range(start, height + min(d, 0)):
+                if new[m] == old[m - d] != old[m]:
+                    res += len(new[m]) + 1
+                elif new[m] == old[m] != old[m - d]:
+                    res -= len(new[m]) + 1
+            return res
+
+        lines = Editor.TERMCMD[21] and Editor.TERMCMD[22]  ## insert/delete lines
+        if scrtop is not None and scrtop[1] == self.margin and 0 < abs(scrtop[0] - top) < height:
+            d = scrtop[0] - top
+            if saved(max(d, 0), d) > 2 * abs(d):
+                if lines and len(Editor.TERMCMD[21]) < abs(d):  ## shorter than single scrolls
+                    self.move_rows(0, d)
+                elif d > 0:
+                    self.scroll_up(d)
+                else:
+                    self.scroll_down(-d)
+                return
+        if not lines:
+            return
+        a = 0
+        while a < height and new[a] == old[a]:
+            a += 1
+        rows = {}  ## text -> first changed row showing it
+        for j in range(height - 1, a - 1, -1):
+            rows[old[j]] = j
+        for i in range(a, height):
+            j = rows.get(new[i])
+            if new[i] and j is not None and j != i:
+                break
+        else:
+            return
+        d = i - j
+        if saved(i, d) > 2 * len(Editor.TERMCMD[21]):  ## worth it
+            self.move_rows(min(i, j), d)
+
+    ## Move the rows from row on d rows down by inserting blank rows, or up by
+    ## deleting rows, within the scroll region
+    def move_rows(self, row, d):
+        self.goto(row, 0)
+        if d > 0:
+            self.wr(Editor.TERMCMD[21].format(n=d))
+            Editor.scrbuf[row + d :] = Editor.scrbuf[row : Editor.height - d]
+            Editor.scrbuf[row : row + d] = [(False, "")] * d
+        else:
+            self.wr(Editor.TERMCMD[22].format(n=-d))
+            Editor.scrbuf[row:] = Editor.scrbuf[row - d :] + [(False, "")] * -d
+
+    ## Update screen row c to l by writing only the changed part of the row. Text
+    ## inserted or deleted at one place is moved by inserting or deleting
+    ## characters, if the terminal can do that and it is shorter. Rows with a mark
+    ## or with matches shown are left to the caller, returning False.
+    def update_line(self, c, l):
+        old = Editor.scrbuf[c]
+        if l[0] or len(l) > 2 or type(old) is not tuple or old[0] or len(old) > 2:
+            return False
+        old, new, width = old[1], l[1], Editor.width
+        if old == "\x00":  ## row content unknown
+            return False
+        p, end = 0, min(len(old), len(new))
+        while p < end and old[p] == new[p]:
+            p += 1
+        n, tail = len(new) - len(old), ""
+        if n == 0 and p < end and len(new) == width:  ## full row, text shifted out?
+            n = new.find(old[p : p + 8], p + 1) - p
+            if n <= 0 or new[p + n :] != old[p : width - n]:
+                n = p - old.find(new[p : p + 8], p + 1)
+                if n >= 0 or old[p - n :] != new[p : width + n]:
+                    n = 0
+                else:
+                    tail = new[width + n :]  ## shifted in at the end
+        elif (n > 0 and new[p + n :] != old[p:]) or (n < 0 and new[p:] != old[p - n :]):
+            n = 0  ## not inserted or deleted at one place
+        cmd = Editor.TERMCMD[19 if n > 0 else 20]
+        self.goto(c, p)
+        if n and cmd and len(cmd) + abs(n) + len(tail) < len(new) - p:
+            if n > 0:
+                self.wr(cmd.format(n=n))
+                self.wr(new[p : p + n])
+                end = p + n
+            else:
+                self.wr(cmd.format(n=-n))
+                end = p
+                if tail:
+                    self.goto(c, width - len(tail))
+                    self.wr(tail)
+                    end = width
+        else:
+            end = len(new)
+            if len(old) == end:  ## skip the unchanged end
+                while end > p and old[end - 1] == new[end - 1]:
+                    end -= 1
+            self.wr(new[p:end])
+            if len(new) < len(old):
+                self.clear_to_eol()
+        Editor.scrpos = (c, end) if end < width else None  ## unknown at the right edge
+        Editor.scrbuf[c] = l
+        return True
+
     def redraw(self, flag):
         self.cursor(False)
         Editor.height, Editor.width = self.io_device.get_screen_size()
         Editor.height -= 1
         Editor.scrbuf = [(False, "\x00")] * Editor.height  ## force delete
+        Editor.scrtop = None
         self.row = min(Editor.height - 1, self.row)
         self.scroll_region(Editor.height)
         self.mouse_reporting(True)  ## enable mouse reporting
+        self.paste_mode(True)  ## enable bracketed paste
         if flag:
-            self.message = PYE_VERSION
+            self.message = PYE_VERSION + "Undo {} Bytes".format(self.undo.bytes + self.redo.bytes)
         if is_micropython:
             gc.collect()
             if flag:
-                self.message += "{} Bytes Memory available".format(gc.mem_free())
+                self.message += ", {} Bytes Memory available".format(gc.mem_free())
         self.changed = "" if self.hash == self.hash_buffer() else "*"
 
-    def get_input(
-        self,
-    ):  ## read from interface/keyboard one byte each and match against function keys
+    def compile_keys(self):  ## KEYMAP as a tree of dicts, with one level per character
+        trie = {}
+        for seq, key in Editor.KEYMAP.items():
+            node = trie
+            for c in seq[:-1]:
+                nxt = node.get(c)
+                if type(nxt) is not dict:  ## new level; a shorter key is kept under ""
+                    nxt = node[c] = {} if nxt is None else {"": nxt}
+                node = nxt
+            if type(node.get(seq[-1])) is dict:
+                node[seq[-1]][""] = key
+            else:
+                node[seq[-1]] = key
+        Editor.key_trie = trie
+        Editor.key_map = dict(Editor.KEYMAP)
+
+    def rd(self):  ## get a single character, even if the io_device returns more
+        if self.key_pend:
+            c = self.key_pend[0]
+            self.key_pend = self.key_pend[1:]
+        else:
+            c = self.io_device.rd()
+            if len(c) > 1:
+                self.key_pend = c[1:]
+                c = c[0]
+        return c
+
+    def get_input(self):  ## read from interface/keyboard and follow the KEYMAP tree
         while True:
-            in_buffer = self.io_device.rd()
-            if in_buffer[0] == "\x1b":  ## starting with ESC, must be fct
-                while True:
-                    in_buffer += self.io_device.rd()
-                    c = in_buffer[-1]
-                    if c == "~" or (c.isalpha() and len(in_buffer) > 2):
-                        break
-                    ## map alt-chr aka ESC-char onto ctrl-chr, except for ESC-O
-                    if len(in_buffer) == 2 and c.isalpha() and c != "O":
-                        in_buffer = chr(ord(in_buffer[1]) & 0x1F)
-                        break
-                    ## stop if sequence cannot be found
-                    if len(in_buffer) >= self.key_max:
-                        break
-                    ## escape entered twice: escape!
-                    if in_buffer == "\x1b\x1b":
-                        in_buffer = "\x1b"
-                        break
-            if in_buffer in Editor.KEYMAP:
-                c = Editor.KEYMAP[in_buffer]
-                if c != KEY_MOUSE:
+            c = self.rd()
+            key = Editor.key_trie.get(c)
+            if c == "\x1b":  ## starting with ESC, must be fct
+                c = self.rd()
+                if c == "\x1b":  ## escape entered twice: escape!
+                    key = key.get("")
+                elif c.isalpha() and c != "O":  ## map alt-chr aka ESC-char onto ctrl-chr
+                    key = Editor.key_trie.get(chr(ord(c) & 0x1F))
+                else:
+                    key = key.get(c)
+            elif key is None and ord(c) >= 32:
+                return KEY_NONE, c
+            while type(key) is dict:
+                c = self.rd()
+                key = key.get(c)
+            if key is None:  ## unknown sequence: skip up to its final character
+                while "\x20" <= c <= "\x3f":
+                    c = self.rd()
+            else:
+                c = key
+                if c == KEY_BPASTE:  ## collect the lines of the pasted text up to ESC[201~
+                    lines = [""]
+                    last = ""
+                    while True:
+                        c = self.rd()
+                        if c == "\r" or (c == "\n" and last != "\r"):
+                            lines.append("")
+                        elif c != "\n":
+                            lines[-1] += c
+                            if c == "~" and lines[-1].endswith("\x1b[201~"):
+                                lines[-1] = lines[-1][:-6]
+                                return KEY_BPASTE, lines
+                        last = c
+                elif c != KEY_MOUSE:
                     return c, None
                 else:  ## special for mice
                     mouse_fct = ord(self.io_device.rd_raw())  ## read 3 more chars
@@ -328,10 +950,8 @@ class Editor:
                         return KEY_SCRLUP, 3
                     else:
                         return KEY_MOUSE, [mouse_x, mouse_y, mouse_fct]  ## set the cursor
-            elif ord(in_buffer[0]) >= 32:
-                return KEY_NONE, in_buffer
 
-    def display_window(self):  ## Update window and status line
+    def display_window(self, update=True):  ## Update window and status line
         ## Force cur_line and col to be in the reasonable bounds
         self.cur_line = min(self.total_lines - 1, max(self.cur_line, 0))
         self.vcol = max(0, min(self.col, len(self.content[self.cur_line])))
@@ -345,9 +965,29 @@ class Editor:
             self.top_line = max(self.cur_line - self.row, 0)
         ## in any case, align row to top_line and cur_line
         self.row = self.cur_line - self.top_line
-        ## update_screen
+        if not update:  ## keys are waiting, show the screen after these
+            return
+        if getattr(self.io_device, "frame", False):  ## collect the frame, write it at once
+            frame = []
+            self.wr = frame.append
+            try:
+                self.update_screen()
+            finally:
+                self.wr = self.io_device.wr
+                self.wr("".join(frame))
+        else:
+            self.update_screen()
+
+    def update_screen(self):
         self.cursor(False)
+        self.shift_rows()
         line = self.top_line
+        show = Editor.find_show and Editor.find_pattern
+        if show:
+            try:
+                self.finder.compile(Editor.find_pattern, Editor.case)
+            except Exception:
+                show = False
         if self.mark is None:
             flag = 0
         else:
@@ -369,12 +1009,27 @@ class Editor:
                         + (((end_line - 1) == line) << 2)
                     )
                 l = (flag, self.content[line][self.margin : self.margin + Editor.width])
-                if (flag and line == self.cur_line) or l != Editor.scrbuf[
-                    c
-                ]:  ## line changed, print it
+                if show and not flag:  ## add the visible part of the matches
+                    spans = tuple(
+                        (max(start - self.margin, 0), end - self.margin)
+                        for start, end in self.line_spans(self.content[line])
+                        if end > self.margin and start < self.margin + Editor.width
+                    )
+                    if spans:
+                        l = (flag, l[1], spans)
+                if (flag and line == self.cur_line) or (
+                    l != Editor.scrbuf[c] and not self.update_line(c, l)
+                ):  ## line changed, print it
                     self.goto(c, 0)
                     if flag == 0:  # no mark
-                        self.wr(l[1])
+                        start = 0
+                        for span in l[2] if len(l) > 2 else ():  ## matches
+                            self.wr(l[1][start : span[0]])
+                            self.hilite(3)
+                            self.wr(l[1][span[0] : span[1]])
+                            self.hilite(0)
+                            start = span[1]
+                        self.wr(l[1][start:])
                     elif flag == 7:  # only line of a mark
                         self.wr(l[1][:start_col])
                         self.hilite(2)
@@ -385,7 +1040,8 @@ class Editor:
                         self.wr(l[1][:start_col])
                         self.hilite(2)
                         self.wr(l[1][start_col:])
-                        self.wr(" ")
+                        if len(l[1]) < Editor.width:  ## a space would wrap and scroll
+                            self.wr(" ")
                         self.hilite(0)
                     elif flag == 5:  # last line of mark
                         self.hilite(2)
@@ -395,25 +1051,31 @@ class Editor:
                     else:  # middle line of a mark
                         self.hilite(2)
                         self.wr(l[1])
-                        self.wr(" ")
+                        if len(l[1]) < Editor.width:
+                            self.wr(" ")
                         self.hilite(0)
                     if len(l[1]) < Editor.width:
                         self.clear_to_eol()
+                    Editor.scrpos = (
+                        (c, len(l[1])) if flag == 0 and len(l[1]) < Editor.width else None
+                    )
+                    if flag and len(l[1]) >= Editor.width - 1:  ## up to the last column, at most
+                        l = (False, "\x00")  ## so written as a whole the next time
                     Editor.scrbuf[c] = l
                 line += 1
         ## display Status-Line
         self.goto(Editor.height, 0)
         self.hilite(1)
-        self.wr(
-            Editor.TERMCMD[14 if Editor.width > 40 else 15].format(
-                chd=self.changed,
-                file=self.fname,
-                row=self.cur_line + 1,
-                total=self.total_lines,
-                col=self.vcol + 1,
-                msg=self.message,
-            )[: self.width - 1]
-        )
+        status = Editor.TERMCMD[14 if Editor.width > 40 else 15].format(
+            chd=self.changed,
+            file=self.fname,
+            row=self.cur_line + 1,
+            total=self.total_lines,
+            col=self.vcol + 1,
+            msg=self.message,
+        )[: self.width - 1]
+        self.wr(status)
+        Editor.scrpos = (Editor.height, len(status))
         self.clear_to_eol()  ## once moved up for mate/xfce4-terminal issue with scroll region
         self.hilite(0)
         self.goto(self.row, self.vcol - self.margin)
@@ -440,7 +1102,7 @@ class Editor:
         return (res[0], res[2]) if res[3] > 0 else (res[0], res[2] - 1)
 
     def line_edit(
-        self, prompt, default, zap=None
+        self, prompt, default, zap=None, step=None
     ):  ## better one: added cursor keys and backsp, delete
         def push_msg(msg):
             self.wr(msg + Editor.TERMCMD[13] * len(msg))  ## Write a message and move cursor back
@@ -450,13 +1112,28 @@ class Editor:
         self.wr(prompt)
         self.wr(default)
         self.clear_to_eol()
+        Editor.scrpos = None  ## not followed while editing the line
         res = default
         pos = len(res)
         del_all = True
         mouse_last = None
+        last = res  ## the text step() has been called with
+        pending = getattr(self.io_device, "pending", None)
         while True:
+            if step is not None and res != last and not (pending and pending()):
+                last = res
+                step(res)  ## may update the window, so show the prompt again
+                self.goto(Editor.height, 0)
+                self.hilite(1)
+                self.wr(prompt)
+                self.wr(res)
+                self.clear_to_eol()
+                Editor.scrpos = None
+                push_msg(res[pos:])
             key, char = self.get_input()  ## Get Char of Fct.
-            if key == KEY_NONE:  ## char to be inserted
+            if key == KEY_BPASTE:  ## pasted text: the first line, as far as it fits
+                key, char = KEY_NONE, char[0][: max(0, self.width - 2 - len(prompt) - len(res))]
+            if key == KEY_NONE and char:  ## char to be inserted
                 if len(prompt) + len(res) < self.width - 2:
                     res = res[:pos] + char + res[pos:]
                     self.wr(res[pos])
@@ -547,8 +1224,6 @@ class Editor:
     def move_up(self):
         if self.cur_line > 0:
             self.cur_line -= 1
-            if self.cur_line < self.top_line:
-                self.scroll_up(1)
 
     def skip_up(self):
         if self.col == 0 and self.cur_line > 0:
@@ -560,14 +1235,12 @@ class Editor:
 
     def move_left(self):
         self.col = self.vcol
-        if not self.skip_up():
+        if not self.skip_up() and self.col > 0:
             self.col -= 1
 
     def move_down(self):
         if self.cur_line < self.total_lines - 1:
             self.cur_line += 1
-            if self.cur_line == self.top_line + Editor.height:
-                self.scroll_down(1)
 
     def skip_down(self, l):
         if self.col >= len(l) and self.cur_line < self.total_lines - 1:
@@ -584,10 +1257,8 @@ class Editor:
     ## This is the regex version of find.
     def find_in_file(self, pattern, col, end):
         Editor.find_pattern = pattern  ## remember it
-        if Editor.case != "y":
-            pattern = pattern.lower()
         try:
-            rex = re_compile(pattern)
+            rex = self.finder.compile(pattern, Editor.case)
         except Exception:
             self.message = "Invalid pattern: " + pattern
             return None
@@ -596,9 +1267,22 @@ class Editor:
             pattern[0] == "^" and col != 0
         ):  # or anchored and not at BOL
             start, col = start + 1, 0  # Skip to the next line
+        self.hash_update()  ## tells the finder about changed lines, too
+        lines, fold = self.finder.lines(self.content)
+        if rex is None:  ## plain text
+            text = self.finder.literal
+            for line in self.finder.candidates(self.content, start, end):
+                l = lines[line].lower() if fold else lines[line]
+                pos = l.find(text, col if line == start else 0)
+                if pos >= 0:  # Bingo
+                    self.cur_line = line
+                    self.col = pos
+                    return len(text)
+            self.message = Editor.find_pattern + " not found (again)"
+            return None
         for line in range(start, end):
-            l = self.content[line][col:]
-            if Editor.case != "y":
+            l = lines[line][col:]
+            if fold:
                 l = l.lower()
             match = rex.search(l)
             if match:  # Bingo
@@ -616,7 +1300,140 @@ class Editor:
             self.message = Editor.find_pattern + " not found (again)"
             return None
 
+    ## Go to the bracket matching the one at the cursor, pair being the opening
+    ## and the closing bracket. The lines are counted by the BracketIndex, so
+    ## only the line with the match is scanned.
+    def match_bracket(self, pair, forward):
+        index = self.brackets.get(pair)
+        if index is None:
+            index = self.brackets[pair] = BracketIndex(pair)
+        self.hash_update()
+        index.update(self.content)
+        way = 1 if forward else -1
+        line = self.cur_line
+        col, depth = index.scan(self.content[line], self.col + way, way, 0)
+        if col < 0:
+            line, depth = (
+                index.forward(line + 1, depth) if forward else index.backward(line - 1, depth)
+            )
+            if line >= 0:
+                l = self.content[line]
+                col = index.scan(l, 0 if forward else len(l) - 1, way, depth)[0]
+        if col >= 0:
+            self.cur_line, self.col = line, col
+        else:
+            self.message = "No match"
+
+    ## Place and length of the first match of the compiled pattern pat in the line
+    ## lo from col on, the same as find_in_file would tell
+    def find_match(self, pat, lo, col):
+        if self.finder.rex is None:
+            pos = lo.find(self.finder.literal, col)
+            return None if pos < 0 else (pos, len(self.finder.literal))
+        match = self.finder.rex.search(lo[col:])
+        if not match:
+            return None
+        if pat[-1:] == "$" and match.group(0)[-1:] != "$":
+            return len(lo) - len(match.group(0)), len(match.group(0))
+        return col + lo[col:].find(match.group(0)), len(match.group(0))
+
+    ## Spans of the matches of the find pattern in line l, kept for the lines shown
+    def line_spans(self, l):
+        if self.span_key != self.finder.key or len(self.span_cache) > 4 * Editor.height:
+            self.span_key, self.span_cache = self.finder.key, {}
+        spans = self.span_cache.get(l)
+        if spans is None:
+            pat, lo, col = Editor.find_pattern, l if Editor.case == "y" else l.lower(), 0
+            spans = []
+            while col <= len(l) and (pat[0] != "^" or col == 0):
+                match = self.find_match(pat, lo, col)
+                if match is None:
+                    break
+                if match[1]:
+                    spans.append((match[0], match[0] + match[1]))
+                col = match[0] + match[1] + (match[1] == 0)
+            self.span_cache[l] = spans
+        return spans
+
+    ## Find as you type: show the first match of pat from the place the Find started.
+    ## The places found so far are kept. Plain text which got longer is searched
+    ## for from the match of the shorter text, since no earlier place can hold it.
+    def find_step(self, pat):
+        self.cur_line, self.col = self.find_from
+        if pat not in self.found:
+            try:
+                plain = self.finder.compile(pat, Editor.case) is None
+            except Exception:  ## find_in_file tells
+                plain = False
+            place = self.found.get(pat[:-1], False) if plain and len(pat) > 1 else False
+            if place is None:  ## the shorter text was not found either
+                self.found[pat] = None
+            else:
+                start = self.col + 1
+                if place:
+                    self.cur_line, start = place[0], place[1]
+                n = self.find_in_file(pat, start, self.total_lines) if pat else None
+                self.found[pat] = None if n is None else (self.cur_line, self.col, n)
+        place = self.found[pat]
+        if place is None:
+            self.cur_line, self.col = self.find_from
+            self.mark = None
+        else:  ## show the match as marked text
+            self.cur_line, self.col = place[0], place[1]
+            self.mark = (place[0], place[1] + place[2])
+        self.display_window()
+
+    ## Replace all places of pat from the cursor position up to end_line and end_col,
+    ## the same ones as found by find_in_file, but in a single pass over the lines.
+    ## A single undo record keeps the lines from the first to the last changed
+    ## line. Returns the number of replacements.
+    def replace_all(self, pat, rpat, end_line, end_col, chain):
+        rex = self.finder.compile(pat, Editor.case)  ## valid, it has been found
+        text = self.finder.literal
+        start, col = self.cur_line, self.col
+        self.hash_update()
+        lines, fold = self.finder.lines(self.content)
+        count = 0
+        new = []  ## the changed lines as (lnum, text)
+        for line in self.finder.candidates(self.content, start, end_line):
+            l = self.content[line]
+            lo = lines[line].lower() if fold else lines[line]
+            if line != start:
+                col = 0
+            if rex is None and Editor.case == "y" and line != end_line - 1:  ## plain text
+                n = l.count(text, col)
+                if n:
+                    count += n
+                    new.append((line, l[:col] + l[col:].replace(text, rpat)))
+                continue
+            parts, done, shift = [], 0, 0  ## the steps of the interactive replace
+            while col <= len(l) and (pat[0] != "^" or col == 0):
+                match = self.find_match(pat, lo, col)
+                if match is None:
+                    break
+                pos, ni = match
+                if line == end_line - 1 and pos + shift >= end_col:
+                    break
+                parts += [l[done:pos], rpat]
+                done = pos + ni
+                shift += len(rpat) - ni
+                col = done + (ni == 0)
+                count += 1
+            if parts:
+                new.append((line, "".join(parts) + l[done:]))
+        if new:  ## a single undo record with the changed lines only
+            old = {}
+            for line, l in new:
+                self.hash_mark(line, [self.content[line]])
+                old[line] = self.content[line]
+                self.content[line] = l
+            self.changed = "*"
+            self.undo.append([new[0][0], 1, old, KEY_NONE, self.col, chain])
+            self.redo.clear()
+        return count
+
     def undo_add(self, lnum, text, key, span=1, chain=False):
+        self.hash_mark(lnum, text)
         if (
             len(self.undo) == 0
             or key == KEY_NONE
@@ -624,22 +1441,61 @@ class Editor:
             or self.undo[-1][0] != lnum
         ):
             self.changed = "*"
-            if len(self.undo) >= self.undo_limit:  ## drop oldest undo(s), if full
-                del self.undo[0]
-            self.undo.append([lnum, span, text, key, self.col, chain])
-            self.redo = []  ## clear re-do list.
+            self.undo.append([lnum, span, text, key, self.col, chain])  ## drops oldest, if full
+            self.redo.clear()  ## clear re-do list.
+
+    ## replace deleted at pos of the current line by inserted. The undo record just
+    ## stores that difference, and adjacent changes of the same kind are merged
+    def change_line(self, pos, deleted, inserted, key, chain=False):
+        l = self.content[self.cur_line]
+        self.hash_mark(self.cur_line, [l])
+        pos = min(pos, len(l))  ## the column may be past the end, e.g. after delete_mark
+        new = l[:pos] + inserted + l[pos + len(deleted) :]
+        if (
+            len(self.undo) == 0
+            or self.undo[-1][3] != key
+            or self.undo[-1][0] != self.cur_line
+            or type(self.undo[-1][2]) is not tuple
+        ):
+            self.changed = "*"
+            self.undo.append([self.cur_line, 1, (pos, deleted, inserted), key, self.col, chain])
+        else:  ## extend the last change to cover both
+            action = self.undo.pop()
+            p, d, i = action[2]
+            start = min(p, pos)
+            end = max(p + len(i), pos + len(deleted))
+            action[2] = (
+                start,
+                l[start:p] + d + l[p + len(i) : end],
+                new[start : end + len(inserted) - len(deleted)],
+            )
+            self.undo.append(action)  ## again, for the size
+        self.redo.clear()  ## a change cannot be redone on a line changed since
+        self.content[self.cur_line] = new
 
     def undo_redo(self, undo, redo):
         chain = True
-        redo_start = len(redo)
+        done = 0
         while len(undo) > 0 and chain:
             action = undo.pop()  ## get action from stack
             if action[3] not in (KEY_INDENT, KEY_DEDENT, KEY_COMMENT):
                 self.cur_line = action[0]  ## wrong for Bkspc of BOL
             self.col = action[4]
-            if len(redo) >= self.undo_limit:  ## mybe not enough
-                del redo[0]
-            if action[1] >= 0:  ## insert or replace line
+            if type(action[2]) is tuple:  ## change within a line
+                pos, deleted, inserted = action[2]
+                l = self.content[action[0]]
+                self.hash_mark(action[0], [l])
+                redo.append(action[0:2] + [(pos, inserted, deleted)] + action[3:])
+                self.content[action[0]] = l[:pos] + deleted + l[pos + len(inserted) :]
+            elif type(action[2]) is dict:  ## lines changed in place, e.g. by replace all
+                lines = {}
+                for lnum, l in action[2].items():
+                    self.hash_mark(lnum, [self.content[lnum]])
+                    lines[lnum] = self.content[lnum]
+                    self.content[lnum] = l
+                redo.append(action[0:2] + [lines] + action[3:])
+            elif action[1] >= 0:  ## insert or replace line
+                self.hash_mark(action[0], self.content[action[0] : action[0] + action[1]])
                 redo.append(
                     action[0:1]
                     + [len(action[2])]
@@ -648,9 +1504,10 @@ class Editor:
                 )
                 if action[0] < self.total_lines:
                     self.content[action[0] : action[0] + action[1]] = action[2]  # insert lines
-                else:
-                    self.content += action[2]
+                else:  ## MicroPython may not call __iadd__ of a LineBuffer
+                    self.content[len(self.content) :] = action[2]
             else:  ## delete lines, restore the current line
+                self.hash_mark(action[0], self.content[action[0] : action[0] - action[1] + 1])
                 redo.append(
                     action[0:1]
                     + [1]
@@ -662,9 +1519,10 @@ class Editor:
                 del self.content[action[0] : action[0] - action[1]]
                 self.content[action[0]] = action[2][0]  # replace current line with save content
             chain = action[5]
-        if (len(redo) - redo_start) > 0:  ## Performed at least one action
+            done += 1
+        if done > 0:  ## Performed at least one action
             redo[-1][5] = True  ## fix the chaining flags for reversed action order.
-            redo[redo_start][5] = False
+            redo[-min(done, len(redo))][5] = False  ## the oldest may have been dropped
             self.total_lines = len(self.content)  ## Reset the length and change indicator
             self.changed = "" if self.hash == self.hash_buffer() else "*"
             self.clear_mark()
@@ -714,6 +1572,25 @@ class Editor:
         self.cur_line = start_row
         self.clear_mark()  ## unset line mark
 
+    def paste(self, lines):  ## insert lines at the cursor, with a single undo record
+        self.col = self.vcol
+        if self.mark is not None:
+            self.delete_mark(False)
+            chain = True  ## undo this delete too when undoing paste
+        else:
+            chain = False  ## just undo the paste
+        ## save the state of lines, complete the first and last line and insert it
+        head, tail = lines[0], lines[-1]  ## save the buffer
+        lines[0] = self.content[self.cur_line][: self.col] + lines[0]
+        lines[-1] += self.content[self.cur_line][self.col :]
+        ni = 1 if len(lines) <= 1 else 1 - len(lines)
+        self.undo_add(
+            self.cur_line, [self.content[self.cur_line]], KEY_NONE, ni, chain
+        )  # replace
+        self.content[self.cur_line : self.cur_line + 1] = lines  # insert lines
+        lines[-1], lines[0] = tail, head  ## restore the buffer
+        self.total_lines = len(self.content)
+
     def handle_edit_keys(self, key, char):  ## keys which change content
         l = self.content[self.cur_line]
         if key == KEY_NONE:  ## character to be added
@@ -724,8 +1601,7 @@ class Editor:
                 chain = True
             else:
                 chain = False
-            self.undo_add(self.cur_line, [l], 0x20 if char == " " else 0x41, 1, chain)
-            self.content[self.cur_line] = l[: self.col] + char + l[self.col :]
+            self.change_line(self.col, "", char, 0x20 if char == " " else 0x41, chain)
             self.col += len(char)
             return key  ## return here for a marginally faster paste
         elif key == KEY_SHIFT_CTRL_LEFT:
@@ -786,8 +1662,7 @@ class Editor:
             if self.mark is not None:
                 self.delete_mark(False)
             elif self.col < len(l):
-                self.undo_add(self.cur_line, [l], KEY_DELETE)
-                self.content[self.cur_line] = l[: self.col] + l[self.col + 1 :]
+                self.change_line(self.col, l[self.col], "", KEY_DELETE)
             elif (self.cur_line + 1) < self.total_lines:  ## test for last line
                 self.undo_add(self.cur_line, [l, self.content[self.cur_line + 1]], KEY_NONE)
                 self.content[self.cur_line] = l + (
@@ -801,8 +1676,7 @@ class Editor:
             if self.mark is not None:
                 self.delete_mark(False)
             elif self.col > 0:
-                self.undo_add(self.cur_line, [l], KEY_BACKSPACE)
-                self.content[self.cur_line] = l[: self.col - 1] + l[self.col :]
+                self.change_line(self.col - 1, l[self.col - 1], "", KEY_BACKSPACE)
                 self.col -= 1
             elif self.cur_line > 0:  # at the start of a line, but not the first
                 self.undo_add(self.cur_line - 1, [self.content[self.cur_line - 1], l], KEY_NONE)
@@ -815,8 +1689,7 @@ class Editor:
                 pos = self.skip_while(l, self.col, Editor.word_char, 1)
                 pos += self.spaces(l[pos:])
                 if self.col < pos:
-                    self.undo_add(self.cur_line, [l], KEY_DEL_WORD)
-                    self.content[self.cur_line] = l[: self.col] + l[pos:]
+                    self.change_line(self.col, l[self.col : pos], "", KEY_DEL_WORD)
         elif key == KEY_DEL_LINE:
             if self.cur_line < (self.total_lines - 1):
                 self.undo_add(self.cur_line, [l, self.content[self.cur_line + 1]], KEY_NONE, 1)
@@ -825,6 +1698,7 @@ class Editor:
             self.content.pop(self.cur_line)
             if self.content == []:
                 self.content = [""]
+            self.total_lines = len(self.content)
         elif key == KEY_HOME:
             self.col = self.spaces(l) if self.col == 0 else 0
         elif key == KEY_END:
@@ -836,11 +1710,26 @@ class Editor:
         elif key == KEY_PGDN:
             self.cur_line += Editor.height
         elif key == KEY_FIND:
-            pat = self.line_edit("Find: ", Editor.find_pattern, "_")
+            find_pattern, top_line, mark = Editor.find_pattern, self.top_line, self.mark
+            self.find_from, self.found = (self.cur_line, self.col), {}
+            pat = self.line_edit("Find: ", Editor.find_pattern, "_", self.find_step)
+            self.cur_line, self.col = self.find_from
+            self.top_line = top_line
+            place = self.found.get(pat)
+            self.found = None
             if pat:
                 self.clear_mark()
-                self.find_in_file(pat, self.col + 1, self.total_lines)
+                if place:  ## found while typing, just find it again
+                    self.cur_line, self.col = place[0], place[1]
+                    self.find_in_file(pat, self.col, self.total_lines)
+                else:
+                    self.find_in_file(pat, self.col + 1, self.total_lines)
                 self.row = Editor.height >> 1
+            else:  ## aborted: back to where it was
+                Editor.find_pattern, self.mark = find_pattern, mark
+                self.message = ""
+        elif key == KEY_FIND_SHOW:  ## toggle highlighting the matches
+            Editor.find_show = not Editor.find_show
         elif key == KEY_FIND_AGAIN:
             if Editor.find_pattern:
                 self.find_in_file(Editor.find_pattern, self.col + 1, self.total_lines)
@@ -888,48 +1777,17 @@ class Editor:
             if self.top_line > 0:
                 self.top_line = max(self.top_line - ni, 0)
                 self.cur_line = min(self.cur_line, self.top_line + Editor.height - 1)
-                self.scroll_up(ni)
         elif key == KEY_SCRLDN:  ##
             ni = 1 if char is None else 3
             if self.top_line + Editor.height < self.total_lines:
                 self.top_line = min(self.top_line + ni, self.total_lines - 1)
                 self.cur_line = max(self.cur_line, self.top_line)
-                self.scroll_down(ni)
         elif key == KEY_MATCH:
             if self.col < len(l):  ## ony within text
                 brackets = "<{[()]}>"
-                srch = l[self.col]
-                i = brackets.find(srch)
+                i = brackets.find(l[self.col])
                 if i >= 0:  ## found a bracket
-                    match = brackets[7 - i]  ## matching bracket
-                    level = 0
-                    way = 1 if i < 4 else -1  ## set direction up/down
-                    i = self.cur_line  ## set starting point
-                    c = self.col + way  ## one off the current position
-                    lstop = (
-                        min(self.total_lines, i + Editor.match_span)
-                        if way > 0
-                        else max(-1, i - Editor.match_span)
-                    )
-                    while i != lstop:
-                        l = self.content[i]
-                        cstop = len(l) if way > 0 else -1
-                        if srch in l or match in l:
-                            while c != cstop:
-                                if l[c] == match:
-                                    if level == 0:  ## match found
-                                        self.cur_line, self.col = i, c
-                                        return key  ## return here instead of ml-breaking
-                                    else:
-                                        level -= 1
-                                elif l[c] == srch:
-                                    level += 1
-                                c += way
-                        i += way
-                        ## set starting point for the next line.
-                        ## treatment for the first and last line is implicit.
-                        c = 0 if way > 0 else len(self.content[i]) - 1
-                    self.message = "No match in {} lines".format(abs(lstop - self.cur_line))
+                    self.match_bracket(brackets[min(i, 7 - i)] + brackets[max(i, 7 - i)], i < 4)
         elif key == KEY_MARK:
             if self.mark is None:
                 self.set_mark()
@@ -1018,9 +1876,8 @@ class Editor:
         elif key == KEY_TAB:
             if self.mark is None:
                 self.col = self.vcol
-                self.undo_add(self.cur_line, [l], KEY_TAB)
                 ni = self.tab_size - self.col % self.tab_size  ## determine spaces to add
-                self.content[self.cur_line] = l[: self.col] + " " * ni + l[self.col :]
+                self.change_line(self.col, "", " " * ni, KEY_TAB)
                 self.col += ni
             else:
                 lrange = self.line_range()
@@ -1043,8 +1900,7 @@ class Editor:
                     (self.col - 1) % self.tab_size + 1, self.spaces(l, self.col)
                 )  ## determine spaces to drop
                 if ni > 0:
-                    self.undo_add(self.cur_line, [l], KEY_BACKTAB)
-                    self.content[self.cur_line] = l[: self.col - ni] + l[self.col :]
+                    self.change_line(self.col - ni, l[self.col - ni : self.col], "", KEY_BACKTAB)
                     self.col -= ni
             else:
                 lrange = self.line_range()
@@ -1067,7 +1923,6 @@ class Editor:
                 )
                 if rpat is not None:  ## start with setting up loop parameters
                     Editor.replc_pattern = rpat
-                    q = ""
                     cur_line, cur_col = self.cur_line, self.col  ## remember pos
                     if self.mark is not None:  ## Replace in Marked area
                         (self.cur_line, self.col, end_line, end_col) = self.mark_range()
@@ -1077,17 +1932,21 @@ class Editor:
                     self.message = "Replace (yes/No/all/quit) ? "
                     chain = False
                     while True:  ## and go
+                        line, col = self.cur_line, self.col
                         ni = self.find_in_file(pat, self.col, end_line)
                         if ni is not None and (
                             self.cur_line != (end_line - 1) or self.col < end_col
                         ):  ## Pattern found
-                            if q != "a":
-                                self.display_window()
-                                key, char = self.get_input()  ## Get Char of Fct.
-                                q = char.lower()
+                            self.display_window()
+                            key, char = self.get_input()  ## Get Char of Fct.
+                            q = char.lower()
                             if q == "q" or key == KEY_QUIT:
                                 break
-                            elif q in ("a", "y"):
+                            elif q == "a":  ## the rest in a single pass
+                                self.cur_line, self.col = line, col
+                                count += self.replace_all(pat, rpat, end_line, end_col, chain)
+                                break
+                            elif q == "y":
                                 self.undo_add(
                                     self.cur_line,
                                     [self.content[self.cur_line]],
@@ -1131,28 +1990,16 @@ class Editor:
             self.col = col
         elif key == KEY_PASTE:  ## insert buffer
             if Editor.yank_buffer:
-                self.col = self.vcol
-                if self.mark is not None:
-                    self.delete_mark(False)
-                    chain = True  ## undo this delete too when undoing paste
-                else:
-                    chain = False  ## just undo the paste
-                ## save the yank buffer state, complete the first and last line and insert it
-                head, tail = Editor.yank_buffer[0], Editor.yank_buffer[-1]  ## save the buffer
-                Editor.yank_buffer[0] = (
-                    self.content[self.cur_line][: self.col] + Editor.yank_buffer[0]
-                )
-                Editor.yank_buffer[-1] += self.content[self.cur_line][self.col :]
-                ni = 1 if len(Editor.yank_buffer) <= 1 else 1 - len(Editor.yank_buffer)
-                self.undo_add(
-                    self.cur_line, [self.content[self.cur_line]], KEY_NONE, ni, chain
-                )  # replace
-                self.content[
-                    self.cur_line : self.cur_line + 1
-                ] = Editor.yank_buffer  # insert lines
-                Editor.yank_buffer[-1], Editor.yank_buffer[0] = tail, head  ## restore the buffer
-
-                self.total_lines = len(self.content)
+                self.paste(Editor.yank_buffer)
+        elif key == KEY_BPASTE:  ## text pasted by the terminal, no auto-indent
+            write_tabs = self.write_tabs
+            for i in range(len(char)):
+                char[i] = self.expandtabs(char[i])
+            self.write_tabs = write_tabs
+            self.paste(char)
+            ## place the cursor behind the pasted text
+            self.col = (self.col if len(char) == 1 else 0) + len(char[-1])
+            self.cur_line += len(char) - 1
         elif key == KEY_WRITE:
             fname = self.line_edit(
                 "Save File: ", self.fname if self.is_dir is False else "", Editor.file_char
@@ -1222,7 +2069,12 @@ class Editor:
                 self.col = self.undo[self.undo_index][4]
         elif key == KEY_UNDO_YANK:
             if len(self.undo) > 0:
-                Editor.yank_buffer = self.undo[self.undo_index][2]
+                text = self.undo[self.undo_index][2]
+                if type(text) is tuple:  ## change within a line: deleted or inserted text
+                    text = [text[1] or text[2]]
+                elif type(text) is dict:  ## lines changed in place
+                    text = [text[lnum] for lnum in sorted(text)]
+                Editor.yank_buffer = text
 
         return key
 
@@ -1232,9 +2084,14 @@ class Editor:
         self.total_lines = len(self.content)
         os.chdir(self.work_dir)
         self.redraw(self.message == "")
+        pending = getattr(self.io_device, "pending", None)  ## tells whether keys are waiting
 
         while True:
-            self.display_window()  ## Update & display window
+            self.display_window(pending is None or not pending())  ## Update & display window
+            if pending is not None and not self.key_pend:  ## use the time waiting for keys
+                self.hash_update()
+                while not pending() and self.finder.idle(self.content):
+                    pass
             key, char = self.get_input()  ## Get Char of Fct-key code
             self.message = ""  ## clear message
 
@@ -1251,9 +2108,10 @@ class Editor:
                 Editor.place_index = 0
                 self.scroll_region(0)
                 self.mouse_reporting(False)  ## disable mouse reporting
+                self.paste_mode(False)  ## disable bracketed paste
                 self.goto(Editor.height, 0)
                 self.clear_to_eol()
-                self.undo = []
+                self.undo.clear()
                 return key
             elif key == KEY_NEXT or key == KEY_PREV or type(key) is Editor:
                 return key
@@ -1275,11 +2133,40 @@ class Editor:
                 sb.write(c)
         return sb.getvalue()
 
-    ## calculate a hash over the content
+    ## The hash of the content is a sum over the hashes of adjacent line pairs,
+    ## relative to the content when loaded. It is updated for the lines changed
+    ## by each edit, such that it never has to scan the whole content.
     def hash_buffer(self):
+        self.hash_update()
+        return self.hash_now
+
+    ## tell that the lines at lnum are about to be replaced
+    def hash_mark(self, lnum, lines):
+        self.hash_update()
+        self.hash_pend = (lnum, lines, len(self.content))
+
+    def hash_update(self):  ## apply a pending change to the hash
+        if self.hash_pend is not None:
+            lnum, old, total = self.hash_pend
+            self.hash_pend = None
+            new = self.content[lnum : lnum + len(old) + len(self.content) - total]
+            nxt = lnum + len(new)  ## the unchanged line following the change
+            self.finder.changed(lnum, len(old), new)
+            for index in self.brackets.values():
+                index.changed(lnum, len(old), new)
+            self.hash_now = (
+                self.hash_now - self.hash_pairs(lnum, old, nxt) + self.hash_pairs(lnum, new, nxt)
+            ) & 0x3FFFFFFF
+
+    ## sum of the pair hashes of lines, preceded by line lnum - 1 and followed by line nxt
+    def hash_pairs(self, lnum, lines, nxt):
         res = 0
-        for line in self.content:
-            res = ((res * 227 + 1) ^ hash(line)) & 0x3FFFFFFF
+        h = hash(self.content[lnum - 1]) if lnum > 0 else 0
+        if nxt < len(self.content):
+            lines = lines + [self.content[nxt]]
+        for line in lines:
+            res += ((h * 227 + 1) ^ hash(line)) & 0x3FFFFFFF
+            h = hash(line)
         return res
 
     ## Read file into content
@@ -1295,6 +2182,9 @@ class Editor:
                         os.listdir(".")
                     )
                     self.is_dir = True
+                elif Editor.content_type is not None:
+                    self.write_tabs = False
+                    self.content = Editor.content_type(fname, self.expandtabs)
                 else:
                     if is_micropython:
                         with open(fname) as f:
@@ -1309,7 +2199,8 @@ class Editor:
                         i += 1
             except OSError:
                 self.message = "Error: file '" + fname + "' may not exist"
-        self.hash = self.hash_buffer()
+        self.hash = self.hash_now = 0
+        self.hash_pend = None
 
     ## write file
     def put_file(self, fname):
@@ -1399,7 +2290,8 @@ def pye_edit(content, tab_size=4, undo=50, io_device=None):
                 break
             elif key in slot:
                 index = slot.index(key)
-
+        except EOFError:  ## no more input
+            break
         except Exception as err:
             slot[index].message = "{!r}".format(err)
             ## raise  ## remove the comment to trace bugs
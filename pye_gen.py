@@ -5,6 +5,11 @@ try:
     import usys as sys
 except Exception:
     import sys
+try:
+    import uselect as select
+except Exception:
+    import select
+from array import array
 
 
 class IO_DEVICE:
@@ -19,10 +24,20 @@ class IO_DEVICE:
             self.rd_raw_fct = sys.stdin.buffer.read
         else:
             self.rd_raw_fct = sys.stdin.read
+        try:
+            self.poll = select.poll()
+            self.poll.register(sys.stdin, select.POLLIN)
+        except Exception:  ## no poll for the console
+            self.poll = None
+
+    frame = True  ## let display_window write each frame at once
 
     def wr(self, s):
         sys.stdout.write(s)
 
+    def pending(self):  ## input waiting to be read
+        return self.poll is not None and len(self.poll.poll(0)) > 0
+
     def rd(self):
         return sys.stdin.read(1)
 
@@ -49,7 +64,17 @@ class IO_DEVICE:
 
 ## test, if the Editor class is already present
 if "pye_edit" not in globals().keys():
-    from pye import pye_edit
+    from pye import pye_edit, is_micropython, Editor, ArrayBuffer
+
+if is_micropython:
+    try:  ## keep files in the compact line storage, if the port has what it needs
+        a = array("H", [0])
+        a[0:1] = array("H", [1, 2])  ## slice assignment of a different size
+        str(memoryview(b"ab")[0:1], "utf-8")
+        slice(0, 1).start
+        Editor.content_type = ArrayBuffer
+    except Exception:
+        pass
 
 
 def pye(*args, tab_size=4, undo=50):
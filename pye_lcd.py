@@ -10,6 +10,11 @@ class IO_DEVICE:
         self.init_terminal()
 
         Editor.KEYMAP["\x08"] = 0x08
+        Editor.TERMCMD[16] = Editor.TERMCMD[17] = ""  ## no bracketed paste
+        Editor.TERMCMD[18] = ""  ## no color for the matches of find
+        Editor.TERMCMD[19] = Editor.TERMCMD[20] = ""  ## no insert/delete characters
+        Editor.TERMCMD[21] = Editor.TERMCMD[22] = ""  ## and lines
+        Editor.TERMCMD[23] = ""  ## no relative cursor moves
 
         import busio, board
 
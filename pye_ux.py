@@ -1,11 +1,14 @@
 #
 # Front-end for Linux
 #
-import os, tty, signal, termios, sys
+import os, tty, signal, termios, sys, select
+from array import array
+from collections import OrderedDict
 
-
-class SignalWindowResize(Exception):
-    pass
+try:
+    import mmap
+except ImportError:
+    mmap = None
 
 
 class IO_DEVICE:
@@ -14,51 +17,340 @@ class IO_DEVICE:
         tty.setraw(device)
         self.sdev = device
         self.key_redraw = key_redraw
+        self.poll = select.poll()
+        self.poll.register(device, select.POLLIN)
+        self.resized = False
+        self.seq = 0  ## 1 after ESC, 2 within an escape sequence
+        self.buf = b""  ## input read ahead, served from pos
+        self.pos = 0
+        self.winch = None
+        try:  ## the SIGWINCH handler writes to a pipe, which is polled together with the tty
+            self.winch, self.winch_wr = os.pipe()
+            os.set_blocking(self.winch, False)  ## neither the drain nor the handler may block
+            os.set_blocking(self.winch_wr, False)
+            signal.signal(signal.SIGWINCH, self.signal_handler)
+            self.poll.register(self.winch, select.POLLIN)
+        except Exception:  ## no pipe or no signals: redraw with Ctrl-E
+            self.winch = None
+
+    frame = True  ## let display_window write each frame at once
 
     def wr(self, s):
-        os.write(1, s.encode("utf-8"))
+        s = memoryview(s.encode("utf-8"))
+        while len(s) > 0:  ## a large frame may take more than one write
+            s = s[os.write(1, s) :]
+
+    def pending(self):  ## the number of bytes waiting to be read
+        if self.pos >= len(self.buf) and not self.resized:
+            self.wait(0)
+        return len(self.buf) - self.pos + self.resized
+
+    def wait(self, timeout=-1):  ## wait for input or a window resize
+        for fd, event in self.poll.poll(timeout):
+            if fd == self.winch:
+                try:  ## all resizes so far need a single redraw
+                    while os.read(self.winch, 256):
+                        pass
+                except BlockingIOError:  ## the pipe is empty
+                    pass
+                self.resized = True
+            elif self.pos >= len(self.buf):  ## read all input available
+                self.buf = os.read(self.sdev, 4096)
+                self.pos = 0
+                if not self.buf:  ## end of input, e.g. the terminal hung up
+                    raise EOFError
 
     def rd(self):
-        while True:
-            try:  ## The signal handler for SIGWINCH raises an exception
-                c = os.read(self.sdev, 1)
-                flag = c[0]
-                while (flag & 0xC0) == 0xC0:  ## utf-8 char collection
-                    c += os.read(self.sdev, 1)
-                    flag <<= 1
-                return c.decode("utf-8")
-            except SignalWindowResize:
-                return chr(self.key_redraw)
+        while self.pos >= len(self.buf) and not (self.resized and self.seq == 0):
+            self.wait()
+        if self.pos >= len(self.buf):  ## a resize, told at the start of a key only
+            self.resized = False
+            return chr(self.key_redraw)
+        c = self.rd_raw()
+        flag = c[0]
+        while (flag & 0xC0) == 0xC0:  ## utf-8 char collection
+            c += self.rd_raw()
+            flag <<= 1
+        if c == b"\x1b" and self.seq == 0:
+            self.seq = 1
+        elif self.seq == 1 and c in (b"[", b"O"):
+            self.seq = 2
+        elif self.seq == 1 or not b"\x20" <= c <= b"\x3f":  ## the final character
+            self.seq = 0
+        return c.decode("utf-8")
 
     def rd_raw(self):
-        return os.read(self.sdev, 1)
+        while self.pos >= len(self.buf):
+            self.wait()
+        self.pos += 1
+        return self.buf[self.pos - 1 : self.pos]
 
     def get_screen_size(self):
-        if hasattr(signal, "SIGWINCH"):
-            signal.signal(signal.SIGWINCH, signal.SIG_IGN)
+        try:
+            size = os.get_terminal_size(self.sdev)
+            return [size.lines, size.columns]
+        except Exception:  ## ask the terminal
+            pass
         self.wr("\x1b[999;999H\x1b[6n")
         pos = ""
-        char = self.rd()  ## expect ESC[yyy;xxxR
-        while char != "R":
-            pos += char
-            char = self.rd()
-        if hasattr(signal, "SIGWINCH"):
-            signal.signal(signal.SIGWINCH, IO_DEVICE.signal_handler)
+        char = self.rd_raw()  ## expect ESC[yyy;xxxR
+        while char != b"R":
+            pos += char.decode()
+            char = self.rd_raw()
         return [int(i, 10) for i in pos.lstrip("\n\x1b[").split(";")]
 
     def deinit_tty(self):
-        termios.tcsetattr(self.sdev, termios.TCSANOW, self.org_termios)
+        try:
+            termios.tcsetattr(self.sdev, termios.TCSANOW, self.org_termios)
+        except termios.error:  ## the terminal has gone
+            pass
+        if self.winch is not None:
+            signal.signal(signal.SIGWINCH, signal.SIG_DFL)
+            os.close(self.winch)
+            os.close(self.winch_wr)
 
-    @staticmethod
-    def signal_handler(sig, frame):
-        raise SignalWindowResize  ## raise the specific exception, which stops os.read()
+    def signal_handler(self, sig, frame):
+        try:
+            os.write(self.winch_wr, b"w")  ## wakes up the poll in wait()
+        except BlockingIOError:  ## the pipe is full, so a wake up is pending anyway
+            pass
 
 
 ## test, if the Editor class is already present
 if "pye_edit" not in globals().keys():
-    from pye_core import pye_edit, is_micropython, KEY_REDRAW, Editor
+    from pye_core import pye_edit, is_micropython, KEY_REDRAW, Editor, LineBuffer, Finder
+    from pye_core import ArrayBuffer
+
+
+## Read access to a file by slicing, for systems without mmap
+class FileText:
+    def __init__(self, f):
+        self.f = f
+
+    def __getitem__(self, s):
+        self.f.seek(s.start)
+        return self.f.read(s.stop - s.start)
+
+
+## Piece table storage for files: the file text stays as it is, indexed by the
+## start offsets of its lines. Files larger than lazy_size are not read but mapped
+## into memory, or read on demand, and only the lines which are accessed are decoded,
+## keeping the most recent ones in a cache. Changed lines go to an append buffer.
+## The buffer content is a list of pieces [in_add, first, count], each being a run
+## of lines of either the file text or the append buffer, and the index of
+## the first line number of each piece.
+class PieceTable(LineBuffer):
+    lazy_size = 0x1000000  ## 16 MByte
+    cache_size = 1024  ## number of decoded lines kept
+
+    def __init__(self, fname, expandtabs):
+        size = os.stat(fname)[6]
+        f = open(fname, "rb")
+        if size < PieceTable.lazy_size:
+            self.text = f.read()
+            f.close()
+        else:
+            try:
+                self.text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                f.close()
+            except Exception:  ## no mmap: keep the file open and read lines on demand
+                self.text = FileText(f)
+        self.expandtabs = expandtabs
+        self.cache = OrderedDict()
+        self.starts = array("Q", [0])  ## start offsets of the lines in the file text
+        pos = 0
+        while pos < size:  ## a single pass over the file, block by block
+            block = self.text[pos : pos + 0x100000]
+            i = block.find(b"\n")
+            while i >= 0:
+                self.starts.append(pos + i + 1)
+                i = block.find(b"\n", i + 1)
+            pos += len(block)
+        if self.starts[-1] < size:  ## last line without newline
+            self.starts.append(size)
+        self.total = len(self.starts) - 1
+        self.add = []  ## append buffer
+        self.pieces = [[False, 0, self.total]] if self.total else []
+        self.index = [0] * len(self.pieces)
+        self.last = 0  ## piece of the most recent access
+
+    def orig(self, j):  ## line j of the file text
+        l = self.cache.pop(j, None)
+        if l is None:
+            l = self.expandtabs(
+                self.text[self.starts[j] : self.starts[j + 1]].decode("utf-8", "ignore").rstrip()
+            )
+            if len(self.cache) >= PieceTable.cache_size:  ## drop the least recently used
+                del self.cache[next(iter(self.cache))]
+        self.cache[j] = l
+        return l
+
+    def find(self, i):  ## the piece holding line i
+        k = self.last
+        if not (k < len(self.index) and self.index[k] <= i < self.index[k] + self.pieces[k][2]):
+            k, hi = 0, len(self.index)
+            while hi - k > 1:
+                mid = (k + hi) >> 1
+                if self.index[mid] <= i:
+                    k = mid
+                else:
+                    hi = mid
+            self.last = k
+        return k
+
+    def split(self, i):  ## let a piece start at line i and return it
+        if i >= self.total:
+            return len(self.pieces)
+        k = self.find(i)
+        off = i - self.index[k]
+        if off:
+            p = self.pieces[k]
+            self.pieces.insert(k + 1, [p[0], p[1] + off, p[2] - off])
+            self.index.insert(k + 1, i)
+            p[2] = off
+            k += 1
+        return k
+
+    def line(self, i):
+        k = self.find(i)
+        in_add, first, _ = self.pieces[k]
+        j = first + i - self.index[k]
+        return self.add[j] if in_add else self.orig(j)
+
+    def splice(self, start, stop, lines):
+        ## lines in the append buffer are replaced in place
+        if stop - start == 1 == len(lines) and start < self.total:
+            k = self.find(start)
+            if self.pieces[k][0]:
+                self.add[self.pieces[k][1] + start - self.index[k]] = lines[0]
+                return
+        k = self.split(start)
+        m = self.split(stop)
+        for p in self.pieces[k:m]:  ## release the dropped lines of the append buffer
+            if p[0]:
+                self.add[p[1] : p[1] + p[2]] = [None] * p[2]
+        new = []
+        if lines:
+            p = self.pieces[k - 1] if k > 0 else None
+            if p and p[0] and p[1] + p[2] == len(self.add):  ## extend the previous piece
+                p[2] += len(lines)
+            else:
+                new = [[True, len(self.add), len(lines)]]
+            self.add += lines
+        self.pieces[k:m] = new
+        self.index[k:m] = [start] * len(new)
+        delta = len(lines) - (stop - start)
+        if delta:
+            for j in range(k + len(new), len(self.index)):
+                self.index[j] += delta
+            self.total += delta
+        self.last = 0
+
+    def __iter__(self):
+        for in_add, first, count in self.pieces:
+            for j in range(first, first + count):
+                yield self.add[j] if in_add else self.orig(j)
+
+
+## Finder with an index of the lines of large buffers. The lines are split into
+## blocks, and for each block the trigrams of its case folded text are kept as
+## a bit mask. A search for plain text skips the blocks lacking one of the
+## trigrams of the text. The index is built while waiting for keys. The blocks
+## touched by a change are merged into one, which is indexed again.
+class BlockFinder(Finder):
+    index_lines = 100000  ## min. number of lines of an indexed buffer
+    block_lines = 512
+    block_bits = 8192  ## size of the masks, a power of 2
+
+    def __init__(self):
+        Finder.__init__(self)
+        self.indexed = None  ## the content of the index
+        self.starts = None  ## first line of each block, and the number of lines
+        self.masks = None  ## trigram mask of each block, None if not indexed yet
+        self.todo = 0  ## blocks before this one are indexed
+        self.query = 0  ## trigram mask of the plain text searched for
+
+    def mask(self, text):
+        bits = bytearray(BlockFinder.block_bits >> 3)
+        for t in set(map("".join, zip(text, text[1:], text[2:]))):
+            h = hash(t) & (BlockFinder.block_bits - 1)
+            bits[h >> 3] |= 1 << (h & 7)
+        return int.from_bytes(bits, "little")
+
+    def compile(self, pattern, case):
+        if (pattern, case) != self.key:
+            Finder.compile(self, pattern, case)
+            self.query = 0 if self.literal is None else self.mask(self.literal.casefold())
+        return self.rex
+
+    def block(self, lnum):  ## the block holding line lnum
+        k, hi = 0, len(self.masks)
+        while hi - k > 1:
+            mid = (k + hi) >> 1
+            if self.starts[mid] <= lnum:
+                k = mid
+            else:
+                hi = mid
+        return k
+
+    def changed(self, lnum, old, new):
+        Finder.changed(self, lnum, old, new)
+        if self.indexed is not None:
+            k = self.block(lnum)
+            m = self.block(lnum + old - 1) if old > 1 else k
+            del self.starts[k + 1 : m + 1]
+            del self.masks[k + 1 : m + 1]
+            self.masks[k] = None
+            delta = len(new) - old
+            if delta:
+                self.starts[k + 1 :] = [s + delta for s in self.starts[k + 1 :]]
+            self.todo = min(self.todo, k)
+
+    def candidates(self, content, start, end):
+        if self.query and content is self.indexed and self.starts[-1] == len(content):
+            return self.blocks(start, end)
+        return range(start, end)
+
+    def blocks(self, start, end):  ## the lines of the blocks which may hold the text
+        k = self.block(start)
+        while start < end:
+            m = self.masks[k]
+            k += 1
+            if m is None or m & self.query == self.query:
+                for line in range(start, min(self.starts[k], end)):
+                    yield line
+            start = self.starts[k]
+
+    def idle(self, content):  ## index the next block
+        if content is not self.indexed or self.starts[-1] != len(content):
+            if len(content) < BlockFinder.index_lines:
+                self.indexed = None
+                return False
+            self.indexed = content
+            self.starts = list(range(0, len(content), BlockFinder.block_lines))
+            self.starts.append(len(content))
+            self.masks = [None] * (len(self.starts) - 1)
+            self.todo = 0
+        k = self.todo
+        while k < len(self.masks) and self.masks[k] is not None:
+            k += 1
+        self.todo = k
+        if k == len(self.masks):
+            return False
+        start, end = self.starts[k], self.starts[k + 1]
+        if end - start > 2 * BlockFinder.block_lines:  ## split a large merged block
+            end = start + BlockFinder.block_lines
+            self.starts.insert(k + 1, end)
+            self.masks.insert(k + 1, None)
+        self.masks[k] = self.mask("\n".join(content[start:end]).casefold())
+        return True
+
 
-Editor.match_span = 500
+if not is_micropython:
+    Editor.content_type = PieceTable
+    Editor.finder_type = BlockFinder
+else:
+    Editor.content_type = ArrayBuffer
 
 
 def pye(*args, tab_size=4, undo=500):
@@ -12,11 +12,16 @@ class IO_DEVICE:
         self.rd_raw_fct = self.rd
         self.peek_char = None
 
+    frame = True  ## let display_window write each frame at once
+
     def wr(self, s):
-        from msvcrt import putwch
+        sys.stdout.write(s)  ## one console write, instead of putwch() for every character
+        sys.stdout.flush()
+
+    def pending(self):  ## input waiting to be read
+        from msvcrt import kbhit
 
-        for c in s:
-            putwch(c)
+        return self.peek_char is not None or kbhit()
 
     def rd(self):
         from msvcrt import getwch
@@ -77,7 +82,6 @@ if "pye_edit" not in globals().keys():
     from pye import pye_edit, Editor, KEY_BACKSPACE
 
 Editor.KEYMAP["\x08"] = KEY_BACKSPACE
-Editor.match_span = 500
 
 
 def pye(*args, tab_size=4, undo=500):
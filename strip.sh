@@ -1,5 +1,8 @@
 # !sh
 #
+# Needs mpy-cross in the PATH, in the version matching the MicroPython firmware,
+# e.g. from the MicroPython build or with pip install mpy-cross.
+#
 cat pye_core.py pye_gen.py | sed "s/\ *#.*$//" | sed "/^$/d" >pye.py
 cat pye_xbee.py pye_gen.py | sed "s/\ *#.*$//" | sed "/^$/d" >pye_x3.py
 cat shebang pye_core.py pye_ux.py >pye
@@ -0,0 +1,175 @@
+#
+# Helpers for the tests: an io_device replaying keys, and a small VT100
+# emulator, which tells what the terminal shows after the editor wrote to it.
+#
+import re
+
+from pye_core import Editor, LineBuffer
+
+
+class ScriptEnd(BaseException):  ## not caught by the editor
+    pass
+
+
+class ScriptIO:
+    def __init__(self, keys, size=(24, 80), check=None):
+        self.keys = list("".join(keys))
+        self.size = size
+        self.check = check  ## called before each key is read
+        self.editor = None
+        self.out = []
+
+    def wr(self, s):
+        self.out.append(s)
+
+    def rd(self):
+        if self.check is not None:
+            self.check()
+        if not self.keys:
+            raise ScriptEnd
+        return self.keys.pop(0)
+
+    def rd_raw(self):
+        return self.rd().encode()
+
+    def get_screen_size(self):
+        return list(self.size)
+
+    def deinit_tty(self):
+        pass
+
+
+## Run an editor on a copy of content with the keys, return it after the last key.
+## A LineBuffer is used as it is.
+def run(content, keys, size=(24, 80), io=None):
+    io = io or ScriptIO(keys, size)
+    Editor.yank_buffer = []  ## shared by all instances
+    ed = Editor(4, 50, io)
+    ed.content = content if isinstance(content, LineBuffer) else list(content)
+    ed.total_lines = len(ed.content)
+    io.editor = ed
+    try:
+        ed.edit_loop()
+    except ScriptEnd:
+        pass
+    return ed
+
+
+## Make the same random changes, as the editor makes them, to a line storage and
+## to a list, and check after each one that both hold the same lines
+def edit_lines(r, buf, ref, count):
+    for _ in range(count):
+        i = r.randrange(len(ref) + 1)
+        j = min(len(ref), i + r.choice((0, 1, 2, 5)))
+        lines = [
+            "{} {}".format(r.random(), "x" * r.randint(0, 80))
+            for _ in range(r.choice((0, 1, 2, 5)))
+        ]
+        op = r.randrange(6)
+        if op == 0 and i < len(ref):
+            buf[i] = ref[i] = lines[0] if lines else ""
+        elif op == 1:
+            buf[i:j] = ref[i:j] = lines
+        elif op == 2 and i < len(ref):
+            del buf[i], ref[i]
+        elif op == 3:
+            del buf[i:j], ref[i:j]
+        elif op == 4 and i < len(ref):
+            assert buf.pop(i) == ref.pop(i)
+        else:
+            buf += lines
+            ref += lines
+        assert len(buf) == len(ref)
+        assert buf[i:j] == ref[i:j]
+        if ref:
+            assert buf[-1] == ref[-1] and buf[i % len(ref)] == ref[i % len(ref)]
+    assert list(buf) == ref and buf == ref
+
+
+class VT:  ## the part of a VT100 used by the editor
+    TOKEN = re.compile(r"\x1b\[[?]?[0-9;]*[A-Za-z@]|\x1b[A-Za-z]|[\s\S]")
+
+    def __init__(self, rows, cols):
+        self.rows, self.cols = rows, cols
+        self.screen = [[" "] * cols for _ in range(rows)]
+        self.row = self.col = 0
+        self.wrap = False  ## the last column was written
+        self.top, self.bottom = 0, rows - 1
+
+    def blank(self):
+        return [" "] * self.cols
+
+    def newline(self):
+        if self.row == self.bottom:
+            del self.screen[self.top]
+            self.screen.insert(self.bottom, self.blank())
+        elif self.row < self.rows - 1:
+            self.row += 1
+
+    def feed(self, s):
+        for t in self.TOKEN.findall(s):
+            if t.startswith("\x1b[") and t[2:3] == "?":
+                continue
+            if t.startswith("\x1b[") and t[-1] == "m":  ## attributes keep the wrap state
+                continue
+            if t.startswith("\x1b["):
+                self.command(t[-1], [int(x) if x else 0 for x in t[2:-1].split(";")])
+            elif t == "\x1bM":
+                if self.row == self.top:
+                    del self.screen[self.bottom]
+                    self.screen.insert(self.top, self.blank())
+                else:
+                    self.row -= 1
+            elif t == "\n":
+                self.newline()
+            elif t == "\r":
+                self.col = 0
+            elif t == "\b":
+                self.col = max(self.col - 1, 0)
+            else:
+                if self.wrap:  ## auto wrap, like xterm
+                    self.col = 0
+                    self.newline()
+                self.screen[self.row][self.col] = t
+                if self.col == self.cols - 1:
+                    self.wrap = True
+                    continue
+                self.col += 1
+            self.wrap = False
+
+    def command(self, cmd, args):
+        n = max(args[0], 1)
+        if cmd == "H":
+            self.row = min(max(args[0], 1), self.rows) - 1
+            self.col = min(max(args[1] if len(args) > 1 else 1, 1), self.cols) - 1
+        elif cmd == "A":
+            self.row = max(self.row - n, 0)
+        elif cmd == "C":
+            self.col = min(self.col + n, self.cols - 1)
+        elif cmd == "D":
+            self.col = max(self.col - n, 0)
+        elif cmd == "K":
+            self.screen[self.row][self.col :] = [" "] * (self.cols - self.col)
+        elif cmd == "@":
+            line = self.screen[self.row]
+            line[self.col :] = ([" "] * n + line[self.col :])[: self.cols - self.col]
+        elif cmd == "P":
+            line = self.screen[self.row]
+            line[self.col :] = line[self.col + n :] + [" "] * min(n, self.cols - self.col)
+        elif cmd in "LM" and self.top <= self.row <= self.bottom:
+            for _ in range(n):
+                if cmd == "L":
+                    del self.screen[self.bottom]
+                    self.screen.insert(self.row, self.blank())
+                else:
+                    del self.screen[self.row]
+                    self.screen.insert(self.bottom, self.blank())
+            self.col = 0
+        elif cmd == "r":
+            self.top = args[0] - 1 if args[0] else 0
+            self.bottom = args[1] - 1 if len(args) > 1 else self.rows - 1
+            self.row = self.col = 0
+        ## n (status report) does not change the text
+
+    def text(self, row):
+        return "".join(self.screen[row]).rstrip()
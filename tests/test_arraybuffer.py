@@ -0,0 +1,46 @@
+import random
+
+from helpers import edit_lines, run
+from pye_core import ArrayBuffer, LineBuffer
+
+
+## an array buffer behaves like the list of the lines of its file, also when
+## its text grows beyond 64k and after unused space is reclaimed
+def test_array_buffer(tmp_path):
+    fname = str(tmp_path / "text")
+    for seed in range(50):
+        r = random.Random(seed)
+        lines = [
+            "{} äö x{}".format(i, "x" * r.randint(0, 60)) for i in range(r.randint(0, 200))
+        ]
+        with open(fname, "w") as f:
+            f.write("\n".join(lines))
+        buf = ArrayBuffer(fname, lambda l: l)
+        assert list(buf) == lines
+        edit_lines(r, buf, lines, 300)
+        buf.compact()
+        assert list(buf) == lines
+
+
+def test_array_buffer_wide(tmp_path):
+    fname = str(tmp_path / "text")
+    ref = ["{:39d}".format(i) for i in range(1600)]
+    with open(fname, "w") as f:
+        f.write("\n".join(ref))
+    buf = ArrayBuffer(fname, lambda l: l)
+    assert not buf.wide
+    edit_lines(random.Random(0), buf, ref, 500)
+    assert buf.wide and len(buf.text) > 0xFFFF
+    assert buf.spare <= max(256, len(buf.text) >> 1)
+
+
+## undo of deleted lines at the end, without += of a LineBuffer, which MicroPython
+## may not support
+def test_array_buffer_undo(tmp_path, monkeypatch):
+    monkeypatch.delattr(LineBuffer, "__iadd__")
+    fname = str(tmp_path / "text")
+    with open(fname, "w") as f:
+        f.write("l0\nl1\nl2")
+    keys = ["\r", "\x1b[1;2B", "\x1b[1;2B", "\x1b[3;2~", "\x1a"]
+    ed = run(ArrayBuffer(fname, lambda l: l), keys)
+    assert list(ed.content) == ["", "l0", "l1", "l2"]
@@ -0,0 +1,67 @@
+import random
+
+from pye_core import BracketIndex
+
+
+def forward(index, content, line, depth):  ## scan all lines from line on
+    for i in range(line, len(content)):
+        net, low = index.count(content[i])
+        if depth + low < 0:
+            return i, depth
+        depth += net
+    return -1, depth
+
+
+def backward(index, content, line, depth):
+    for i in range(line, -1, -1):
+        net, low = index.count(content[i])
+        if net - low > depth:
+            return i, depth
+        depth -= net
+    return -1, depth
+
+
+## the index tells the same lines as a scan of all lines, after lines are changed,
+## inserted and deleted, with small blocks, so that many blocks are involved
+def test_bracket_index(monkeypatch):
+    monkeypatch.setattr(BracketIndex, "block_lines", 4)
+    for seed in range(200):
+        r = random.Random(seed)
+
+        def line():
+            return "".join(r.choice("((){} x") for _ in range(r.randint(0, 6)))
+
+        content = [line() for _ in range(r.randint(1, 200))]
+        index = BracketIndex("()")
+        for _ in range(30):
+            lnum = r.randrange(len(content))
+            old = min(r.choice((0, 1, 1, 2, 10)), len(content) - lnum)
+            new = [line() for _ in range(r.choice((0, 1, 1, 2, 10)))]
+            if old == len(content) and not new:
+                continue
+            content[lnum : lnum + old] = new
+            index.changed(lnum, old, new)
+            if r.random() < 0.5:
+                index.update(content)
+                for _ in range(5):
+                    line_no, depth = r.randrange(len(content)), r.randrange(3)
+                    expect = forward(index, content, line_no, depth)
+                    assert index.forward(line_no, depth) == expect
+                    expect = backward(index, content, line_no, depth)
+                    assert index.backward(line_no, depth) == expect
+
+
+## inserting or deleting a line updates the tree in place
+def test_bracket_index_local():
+    content = ["(x"] * 1000 + [")"] * 1000
+    index = BracketIndex("()")
+    index.update(content)
+    tree = index.net
+    content[10:11] = []
+    index.changed(10, 1, [])
+    content[500:500] = ["((", "x"]
+    index.changed(500, 0, content[500:502])
+    index.update(content)
+    assert index.net is tree
+    assert index.forward(1, 0) == forward(index, content, 1, 0)
+    assert index.backward(1999, 0) == backward(index, content, 1999, 0)
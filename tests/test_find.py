@@ -0,0 +1,120 @@
+import random
+
+from helpers import ScriptIO, run
+from pye_core import Editor, Finder, re_compile
+
+
+## the pattern is compiled once, and plain text is searched for without a regex
+def test_finder_compile():
+    finder = Finder()
+    rex = finder.compile("a.c", "y")
+    assert rex is not None and finder.literal is None
+    assert finder.compile("a.c", "y") is rex
+    assert finder.compile("AbC", "n") is None and finder.literal == "abc"
+    assert finder.compile("AbC", "y") is None and finder.literal == "AbC"
+
+
+## the lower case copy of the lines follows the changes
+def test_finder_lines():
+    r = random.Random(0)
+    content = ["Line {} ABC".format(i) for i in range(100)]
+    finder = Finder()
+    finder.compile("abc", "n")
+    assert finder.lines(content) == ([l.lower() for l in content], False)
+    for _ in range(200):
+        lnum = r.randrange(len(content))
+        old = min(r.randrange(3), len(content) - lnum)
+        new = ["NEW {} Line".format(r.random()) for _ in range(r.randrange(3))]
+        content[lnum : lnum + old] = new
+        finder.changed(lnum, old, new)
+    assert finder.lines(content) == ([l.lower() for l in content], False)
+
+
+## find with the case ignored after changes of the text
+def test_find_after_change():
+    find = ["\x06", "\x1b[3~", "Abc", "\r"]
+    keys = find + ["\x1b[A", "\x1b[H", "aBc", "\x1b[A", "\x1b[A", "\x1b[H"] + find + ["X"]
+    ed = run(["x", "y", "z", "q abc"], keys)
+    assert ed.content == ["x", "y", "XaBcz", "q abc"]
+    ed = run(["x", "y", "z", "q abc"], keys + ["\x0e", "Y"])
+    assert ed.content == ["x", "y", "XaBcz", "q Yabc"]
+
+
+## the blocks of the index, which are searched for plain text, hold all lines with
+## the text, also after changes, and with blocks being indexed while others change
+def test_block_finder(monkeypatch):
+    from pye_ux import BlockFinder
+
+    monkeypatch.setattr(BlockFinder, "index_lines", 50)
+    monkeypatch.setattr(BlockFinder, "block_lines", 8)
+    for seed in range(50):
+        r = random.Random(seed)
+
+        def line():
+            return "".join(r.choice("abcAB x") for _ in range(r.randint(0, 12)))
+
+        content = [line() for _ in range(r.randint(50, 400))]
+        finder = BlockFinder()
+        for _ in range(100):
+            if r.random() < 0.3:
+                finder.idle(content)
+            lnum = r.randrange(len(content))
+            old = min(r.choice((0, 1, 1, 3, 20)), len(content) - lnum)
+            new = [line() for _ in range(r.choice((0, 1, 1, 3, 20)))]
+            content[lnum : lnum + old] = new
+            finder.changed(lnum, old, new)
+            text = r.choice(("abc", "Bax", "cab", "ab"))
+            finder.compile(text, r.choice("yn"))
+            start = r.randrange(len(content))
+            end = r.randrange(start, len(content) + 1)
+            found = set(finder.candidates(content, start, end))
+            assert found <= set(range(start, end))
+            for i in range(start, end):
+                assert i in found or text.lower() not in content[i].lower()
+        while finder.idle(content):
+            pass
+        finder.compile("abc", "n")
+        assert len(content) < 50 or type(finder.candidates(content, 0, len(content))) is not range
+
+
+## a line storage is searched line by line, without a lower case copy of all lines
+def test_find_line_storage(tmp_path):
+    from pye_ux import PieceTable
+
+    fname = str(tmp_path / "text")
+    with open(fname, "w") as f:
+        f.write("x\ny\nz\nq aBc\n")
+    content = PieceTable(fname, lambda l: l)
+    ed = run(content, ["\x06", "\x1b[3~", "Abc", "\r", "X"])
+    assert list(ed.content) == ["x", "y", "z", "q XaBc"]
+    assert ed.finder.lower is None
+
+
+class RegexFinder(Finder):  ## searches plain text with a regex, too
+    def compile(self, pattern, case):
+        Finder.compile(self, pattern, case)
+        if self.rex is None:
+            self.rex, self.literal = re_compile(self.literal), None
+        return self.rex
+
+
+def find_all(finder, content, pattern):  ## the places found from the top, one after the other
+    ed = Editor(4, 50, ScriptIO([]))
+    ed.content, ed.total_lines, ed.finder = content, len(content), finder
+    found = []
+    while ed.find_in_file(pattern, ed.col + 1, len(content)) is not None:
+        if found and (ed.cur_line, ed.col) <= found[-1]:
+            break
+        found.append((ed.cur_line, ed.col))
+    return found
+
+
+## plain text is found at the same places with str.find as with a regex
+def test_find_plain_text(monkeypatch):
+    for seed in range(100):
+        r = random.Random(seed)
+        content = ["".join(r.choice("abAB x") for _ in range(r.randint(0, 30))) for _ in range(40)]
+        pattern = "".join(r.choice("abAB x") for _ in range(r.randint(1, 3)))
+        monkeypatch.setattr(Editor, "case", r.choice("yn"))
+        found = find_all(Finder(), content, pattern)
+        assert found == find_all(RegexFinder(), content, pattern), seed
@@ -0,0 +1,26 @@
+from helpers import ScriptIO, run
+
+
+class FrameIO(ScriptIO):  ## counts the writes between the keys
+    frame = True
+
+    def __init__(self, keys):
+        ScriptIO.__init__(self, keys, (24, 80), self.mark)
+        self.marks = []
+
+    def mark(self):
+        self.marks.append(len(self.out))
+
+
+## with frame set, a screen update is written at once, with the same text
+def test_frame():
+    content = ["{:3d} {}".format(i, "text " * 12) for i in range(100)]
+    keys = ["\x1b[B"] * 5 + ["x", "\x1b[1;2B", "\x1b[1;2B", "\x1b[F", "\x7f", "\x1b[6~", "y"]
+    io = FrameIO(keys)
+    run(content, [], io=io)
+    plain = ScriptIO(keys)
+    run(content, [], io=plain)
+    assert "".join(io.out) == "".join(plain.out)
+    assert len(io.out) < len(plain.out)
+    writes = [b - a for a, b in zip(io.marks, io.marks[1:])]
+    assert max(writes) == 1
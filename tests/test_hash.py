@@ -0,0 +1,32 @@
+import random
+
+from helpers import run
+from test_undo import KEYS, UNDO
+
+
+def pairs(lines):  ## the pair hash sum of all lines, computed from scratch
+    res = h = 0
+    for line in lines:
+        res += ((h * 227 + 1) ^ hash(line)) & 0x3FFFFFFF
+        h = hash(line)
+    return res
+
+
+## the hash kept up to date by each edit is the one of the whole content
+def test_hash_incremental():
+    for seed in range(150):
+        r = random.Random(seed)
+        content = ["".join(r.choice("ab x") for _ in range(r.randint(0, 20))) for _ in range(10)]
+        ed = run(content, [r.choice(KEYS) for _ in range(r.randint(1, 60))])
+        assert ed.hash_buffer() == (pairs(ed.content) - pairs(content)) & 0x3FFFFFFF, seed
+
+
+## the hash returns to 0, and the text is unchanged, after the edits are undone
+def test_hash_undo():
+    content = ["first", "second", "third"]
+    keys = ["\x1b[B", "xy", "\r", "\x1b[3~", "\x18"]
+    ed = run(content, keys)
+    assert ed.hash_buffer() != 0 and ed.changed == "*"
+    ed = run(content, keys + [UNDO] * len(ed.undo) + ["\x1b[A"])
+    assert ed.content == content
+    assert ed.hash_buffer() == 0 and ed.changed == ""
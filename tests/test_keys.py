@@ -0,0 +1,13 @@
+from helpers import run
+from pye_core import Editor, KEY_END, KEY_HOME
+
+
+## a changed binding of an existing key is used by the next editor
+def test_rebind_key():
+    assert run(["abc"], ["\x1b[H", "x"]).content == ["xabc"]
+    Editor.KEYMAP["\x1b[H"] = KEY_END
+    try:
+        assert run(["abc"], ["\x1b[H", "x"]).content == ["abcx"]
+    finally:
+        Editor.KEYMAP["\x1b[H"] = KEY_HOME
+    assert run(["abc"], ["\x1b[H", "x"]).content == ["xabc"]
@@ -0,0 +1,55 @@
+import random
+
+from helpers import edit_lines
+from pye_ux import PieceTable
+
+
+def expandtabs(l):
+    return l.expandtabs(8)
+
+
+def write(tmp_path, text):
+    fname = str(tmp_path / "text")
+    with open(fname, "wb") as f:
+        f.write(text)
+    return fname
+
+
+## a piece table behaves like the list of the lines of its file
+def test_piece_table(tmp_path):
+    for seed in range(100):
+        r = random.Random(seed)
+        lines = [
+            "{}\tline {}".format(i, "y" * r.randint(0, 40)) for i in range(r.randint(0, 300))
+        ]
+        text = "\n".join(lines) + ("\n" if r.random() < 0.5 else "")
+        buf = PieceTable(write(tmp_path, text.encode()), expandtabs)
+        ref = [expandtabs(l).rstrip() for l in lines]
+        assert list(buf) == ref
+        edit_lines(r, buf, ref, 100)
+
+
+def test_piece_table_lines(tmp_path):
+    buf = PieceTable(write(tmp_path, b"a \r\nb\xff\n\nc"), expandtabs)
+    assert list(buf) == ["a", "b", "", "c"]
+    assert list(PieceTable(write(tmp_path, b""), expandtabs)) == []
+
+
+## large files are mapped into memory, or read on demand without mmap, and decode
+## only the lines accessed, keeping a few of them in the cache
+def test_piece_table_lazy(tmp_path, monkeypatch):
+    import pye_ux
+
+    lines = ["line {}\t{}".format(i, "z" * (i % 50)) for i in range(3000)]
+    fname = write(tmp_path, "\n".join(lines).encode())
+    monkeypatch.setattr(PieceTable, "lazy_size", 0)
+    monkeypatch.setattr(PieceTable, "cache_size", 16)
+    for mmap in (pye_ux.mmap, None):
+        monkeypatch.setattr(pye_ux, "mmap", mmap)
+        buf = PieceTable(fname, expandtabs)
+        assert type(buf.text) is not bytes
+        assert len(buf) == len(lines) and buf[1234] == expandtabs(lines[1234])
+        assert len(buf.cache) == 1
+        ref = [expandtabs(l).rstrip() for l in lines]
+        edit_lines(random.Random(1), buf, ref, 200)
+        assert len(buf.cache) <= 16
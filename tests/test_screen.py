@@ -0,0 +1,114 @@
+import random
+
+from helpers import VT, ScriptIO, run
+from pye_core import Editor
+
+KEYS = [
+    "\x1b[A", "\x1b[B", "\x1b[C", "\x1b[D", "\x1b[5~", "\x1b[6~", "\x1b[H", "\x1b[F",
+    "\x1b[1;2B", "\x1b[1;2A", "\x1b[1;2C", "\t", "\x1b[Z", "x", "ab", "\r", "\x7f",
+    "\x1b[3~", "\x18", "\x16", "\x1a", "\x19", "\x1b[1;5A", "\x1b[1;5B",
+]
+
+
+class ScreenIO(ScriptIO):  ## checks the screen of the terminal before each key
+    def __init__(self, keys, size):
+        ScriptIO.__init__(self, keys, size, self.compare)
+        self.vt = VT(*size)
+        self.errors = []
+        self.bytes = 0
+
+    def wr(self, s):
+        self.vt.feed(s)
+        self.bytes += len(s)
+
+    def compare(self):
+        ed = self.editor
+        if ed is None or self.errors:
+            return
+        for row in range(Editor.height):
+            line = ed.top_line + row
+            text = ""
+            if line < ed.total_lines:
+                text = ed.content[line][ed.margin : ed.margin + Editor.width]
+            if self.vt.text(row) != text.rstrip():
+                self.errors.append((row, self.vt.text(row), text))
+        if Editor.scrpos is not None and Editor.scrpos != (self.vt.row, self.vt.col):
+            self.errors.append(("cursor", Editor.scrpos, (self.vt.row, self.vt.col)))
+
+
+def check_screen(seed, size):
+    r = random.Random(seed)
+    content = [
+        "".join(r.choice("ab( )x") for _ in range(r.randint(0, 40)))
+        for _ in range(r.randint(1, 40))
+    ]
+    keys = [r.choice(KEYS) for _ in range(r.randint(5, 80))]
+    io = ScreenIO(keys, size)
+    run(content, [], size, io)
+    return io.errors
+
+
+def test_screen_matches_text():
+    for seed in range(200):
+        assert check_screen(seed, (8, 20)) == [], seed
+        assert check_screen(seed, (24, 40)) == [], seed
+
+
+## a marked row as wide as the screen on the last row must not scroll it
+def test_full_width_mark():
+    content = ["{} b))b ".format(i) * 5 for i in range(30)]
+    keys = ["\x1b[B"] * 12 + ["\x1b[1;2A"] * 8 + ["\t", "\x1b[5~", "\x1b[6~"]
+    io = ScreenIO(keys, (8, 20))
+    run(content, [], (8, 20), io)
+    assert io.errors == []
+
+
+## the same for terminals without the sequences to insert or delete characters
+## and lines, and for relative cursor moves
+def test_screen_without_edit_sequences(monkeypatch):
+    monkeypatch.setattr(Editor, "TERMCMD", Editor.TERMCMD[:19] + [""] * 5 + Editor.TERMCMD[24:])
+    for seed in range(100):
+        assert check_screen(seed, (8, 20)) == [], seed
+
+
+## typing into a line inserts or deletes the character, not writing the rest of the row
+def test_typing_writes_little():
+    marks = []
+    content = ["{:3d} {}".format(i, "text " * 12) for i in range(40)]
+    io = ScriptIO(["\x1b[B"] * 5 + ["\x1b[C"] * 9 + ["x", "y", "\x7f"], (24, 80))
+    io.check = lambda: marks.append(len(io.out))
+    run(content, [], (24, 80), io)
+    for a, b in zip(marks[-4:], marks[-3:]):
+        assert "text" not in "".join(io.out[a:b])
+
+
+def replay(content, keys, size=(24, 80)):  ## the terminal after the keys, checked on the way
+    io = ScreenIO(keys, size)
+    run(content, [], size, io)
+    assert io.errors == []
+    return io, [io.vt.text(row) for row in range(size[0])]
+
+
+## rows moved by inserting or deleting lines show the same as rows written again,
+## and take fewer bytes
+def test_move_rows(monkeypatch):
+    content = ["line {} {}".format(i, "text " * 10) for i in range(60)]
+    keys = ["\x1b[B"] * 5 + ["\r", "\r", "\x18", "\x18", "\x18", "\x16", "\x16"]
+    moved, screen = replay(content, keys)
+    monkeypatch.setattr(Editor, "TERMCMD", Editor.TERMCMD[:21] + ["", ""] + Editor.TERMCMD[23:])
+    written, same = replay(content, keys)
+    assert screen == same
+    assert moved.bytes < written.bytes
+
+
+## moves of the window by pages and lines show the same with and without inserting
+## or deleting lines, and a move by a line writes the new row only
+def test_page_moves(monkeypatch):
+    content = ["line {} {}".format(i, "text " * 10) for i in range(60)]
+    keys = ["\x1b[6~", "\x1b[6~", "\x1b[5~"] + ["\x1b[B"] * 30 + ["\x1b[1;5B"] * 3
+    keys += ["\x1b[1;5A"] * 3 + ["\x1b[5~", "\x1b[6~", "\x1b[5~"]
+    io, screen = replay(content, keys, (10, 60))
+    scrolled, _ = replay(content, keys + ["\x1b[1;5B"], (10, 60))
+    assert scrolled.bytes - io.bytes < 3 * 60  ## the new row and the status line
+    monkeypatch.setattr(Editor, "TERMCMD", Editor.TERMCMD[:21] + ["", ""] + Editor.TERMCMD[23:])
+    assert replay(content, keys, (10, 60))[1] == screen
@@ -0,0 +1,55 @@
+import random
+
+from helpers import run
+
+UNDO, REDO = "\x1a", "\x19"
+KEYS = [
+    "\x1b[A", "\x1b[B", "\x1b[C", "\x1b[D", "\x1b[H", "\x1b[F", "\x1b[1;2C", "\x1b[1;2B",
+    "x", "ab", " ", "\r", "\x7f", "\x1b[3~", "\t", "\x1b[Z", "\x18", "\x16", "\x04",
+]
+
+
+def undo_all(content, keys):
+    ed = run(content, keys)
+    changed = list(ed.content)
+    n = len(ed.undo)
+    ed = run(content, keys + [UNDO] * n)
+    undone = list(ed.content)
+    ed = run(content, keys + [UNDO] * n + [REDO] * n)
+    return changed, undone, list(ed.content)
+
+
+## a change typed after deleting a mark with the cursor past the end of the line
+def test_redo_after_delete_mark():
+    content = ["short", "ab", "z" * 24]
+    keys = ["\x1b[B", "\x1b[B", "\x1b[F", "\x1b[A", "\x1b[A", "\x1b[1;2C", "x"]
+    ed = run(content, keys + [UNDO, REDO])
+    assert ed.content == ["shortabx", "z" * 24]
+    changed, undone, redone = undo_all(content, keys)
+    assert undone == content
+    assert redone == changed
+
+
+def test_undo_redo_round_trip():
+    for seed in range(150):
+        r = random.Random(seed)
+        content = [
+            "".join(r.choice("ab x") for _ in range(r.randint(0, 30)))
+            for _ in range(r.randint(1, 8))
+        ]
+        keys = [r.choice(KEYS) for _ in range(r.randint(1, 40))]
+        changed, undone, redone = undo_all(content, keys)
+        assert undone == content, seed
+        assert redone == changed, seed
+
+
+## replace all keeps only the lines it changed in its undo record
+def test_replace_all_record():
+    content = ["line {}".format(i) for i in range(1000)]
+    content[0] = content[999] = "match here"
+    replace = ["\x12", "\x1b[3~", "match", "\r", "\x1b[3~", "found", "\r", "a"]
+    ed = run(content, replace)
+    assert ed.content[0] == ed.content[999] == "found here"
+    assert len(ed.undo) == 1 and ed.undo.bytes < 30
+    assert run(content, replace + [UNDO]).content == content
+    assert run(content, replace + [UNDO, REDO]).content == ed.content
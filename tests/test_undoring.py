@@ -0,0 +1,41 @@
+from pye_core import UndoRing
+
+
+def record(text):
+    return [0, 1, text, 0, 0, False]
+
+
+## the ring keeps the newest limit records, in order, like a list would
+def test_undo_ring_limit():
+    ring, ref = UndoRing(5), []
+    for i in range(23):
+        ring.append(record([str(i)]))
+        ref = (ref + [record([str(i)])])[-5:]
+        if i % 3 == 2:
+            assert ring.pop() == ref.pop()
+        assert len(ring) == len(ref)
+        assert [ring[j] for j in range(len(ring))] == ref
+        assert ring[-1] == ref[-1]
+    ring.clear()
+    assert len(ring) == 0 and ring.bytes == 0
+    try:
+        ring.pop()
+        assert False
+    except IndexError:
+        pass
+
+
+## with a budget, the oldest records are dropped to keep the size of the saved text
+## below it, counting a line end for each line, but the newest is always kept
+def test_undo_ring_budget():
+    ring = UndoRing(100, 20)
+    ring.append(record(["abcd", "efgh"]))  ## 10
+    ring.append(record((3, "xy", "z")))  ## 3
+    ring.append(record({4: "ijk", 9: ""}))  ## 5
+    assert len(ring) == 3 and ring.bytes == 18
+    ring.append(record(["12"]))  ## 3
+    assert len(ring) == 3 and ring.bytes == 11
+    ring.append(record(["x" * 50]))
+    assert len(ring) == 1 and ring.bytes == 51
+    ring.pop()
+    assert ring.bytes == 0
@@ -0,0 +1,70 @@
+import os
+
+from pye_ux import IO_DEVICE
+
+
+## many resizes while the editor is busy neither block nor need more than one redraw
+def test_resize_pipe():
+    master, slave = os.openpty()
+    io = IO_DEVICE(slave, 0x05)
+    try:
+        for _ in range(100000):  ## more than the pipe holds
+            io.signal_handler(None, None)
+        assert io.pending() == 1
+        assert io.rd() == "\x05"
+        assert io.pending() == 0
+        os.write(master, b"a")
+        assert io.rd() == "a"
+    finally:
+        io.deinit_tty()
+        os.close(master)
+        os.close(slave)
+
+
+## a resize during an escape sequence is told after its final character
+def test_resize_within_key():
+    master, slave = os.openpty()
+    io = IO_DEVICE(slave, 0x05)
+    try:
+        os.write(master, b"\x1b")
+        assert io.rd() == "\x1b"
+        io.signal_handler(None, None)
+        os.write(master, b"[1;5Ax")
+        assert "".join(io.rd() for _ in range(7)) == "[1;5Ax\x05"
+    finally:
+        io.deinit_tty()
+        os.close(master)
+        os.close(slave)
+
+
+## the end of the input ends the editor instead of reading again and again
+def test_end_of_input():
+    from pye_core import pye_edit
+
+    master, slave = os.openpty()
+    io = IO_DEVICE(slave, 0x05)
+    try:
+        os.close(master)
+        assert pye_edit([["abc"]], io_device=io) == ["abc"]
+    finally:
+        io.deinit_tty()
+        os.close(slave)
+
+
+## pending() tells the bytes read ahead and waiting, which are read as a block
+def test_pending():
+    master, slave = os.openpty()
+    io = IO_DEVICE(slave, 0x05)
+    try:
+        assert io.pending() == 0
+        os.write(master, "abcä".encode())
+        assert io.pending() == 5
+        assert io.rd() == "a" and io.pending() == 4
+        assert io.rd() + io.rd() + io.rd() == "bcä"
+        assert io.pending() == 0
+        io.signal_handler(None, None)
+        assert io.pending() == 1
+    finally:
+        io.deinit_tty()
+        os.close(master)
+        os.close(slave)